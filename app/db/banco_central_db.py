@@ -1,4 +1,5 @@
 import sqlite3
+import threading
 from datetime import datetime
 from app.db.sqlite import get_db
 
@@ -32,6 +33,89 @@ class BancoCentralDB:
         conn.commit()
         conn.close()
 
+
+# Bases criadas antes das séries não têm as tabelas (ver sqlite/create_radar_db.sql):
+# são criadas uma vez por processo, fora do caminho de cada leitura
+_series_lock = threading.Lock()
+_series_criadas = False
+
+
+def _criar_tabelas_series():
+    global _series_criadas
+    if _series_criadas:
+        return
+    with _series_lock:
+        if _series_criadas:
+            return
+        conn = get_db()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS series_banco_central (
+                codigo INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                valor REAL NOT NULL,
+                PRIMARY KEY (codigo, data)
+            );
+            CREATE TABLE IF NOT EXISTS series_banco_central_sync (
+                codigo INTEGER PRIMARY KEY,
+                sincronizado_em TEXT NOT NULL
+            );
+        """)
+        conn.close()
+        _series_criadas = True
+
+
+class SeriesBancoCentralDB:
+    """
+    Séries históricas do Banco Central (SGS) na base SQLite, com um ponto por
+    (codigo, data) e a data da última sincronização de cada série.
+    """
+
+    def __init__(self):
+        _criar_tabelas_series()
+
+    def get_intervalo(self, codigo: int) -> tuple[str | None, str | None, str | None]:
+        """
+        Retorna a primeira e a última data gravadas (YYYY-MM-DD) e a data/hora
+        da última sincronização da série.
+        """
+        conn = get_db()
+        row = conn.execute("""
+            SELECT MIN(data) AS inicio, MAX(data) AS fim,
+                   (SELECT sincronizado_em FROM series_banco_central_sync WHERE codigo = ?) AS sincronizado_em
+            FROM series_banco_central WHERE codigo = ?
+        """, (codigo, codigo)).fetchone()
+        conn.close()
+        return row['inicio'], row['fim'], row['sincronizado_em']
+
+    def get_serie(self, codigo: int, inicio: str, fim: str) -> list[tuple[str, float]]:
+        """
+        Busca os pontos da série entre as datas (YYYY-MM-DD, inclusive), em ordem.
+        """
+        conn = get_db()
+        rows = conn.execute("""
+            SELECT data, valor FROM series_banco_central
+            WHERE codigo = ? AND data BETWEEN ? AND ?
+            ORDER BY data
+        """, (codigo, inicio, fim)).fetchall()
+        conn.close()
+        return [(row['data'], row['valor']) for row in rows]
+
+    def save_serie(self, codigo: int, pontos: list[tuple[str, float]]):
+        """
+        Insere ou atualiza os pontos (data YYYY-MM-DD, valor) e registra a sincronização.
+        """
+        conn = get_db()
+        conn.executemany("""
+            INSERT OR REPLACE INTO series_banco_central (codigo, data, valor)
+            VALUES (?, ?, ?)
+        """, [(codigo, data, valor) for data, valor in pontos])
+        conn.execute("""
+            INSERT OR REPLACE INTO series_banco_central_sync (codigo, sincronizado_em)
+            VALUES (?, ?)
+        """, (codigo, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+        conn.close()
+
 # 🔥 Função de teste manual
 def main():
     repo = BancoCentralDB()
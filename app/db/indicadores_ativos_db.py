@@ -27,6 +27,32 @@ class IndicadoresAtivosDB:
         conn.close()
         return tickers
 
+    def get_ativos(self) -> dict:
+        """
+        Retorna todos os tickers cadastrados com seu tipo.
+
+        :return: Dicionário ticker -> tipo (ex: "acoes", "logistica")
+        """
+        conn = get_db()
+        cur = conn.execute("SELECT ticker, tipo FROM ativos")
+        ativos = {row['ticker']: row['tipo'] for row in cur.fetchall()}
+        conn.close()
+        return ativos
+
+    def get_tickers_transacionados(self, tabela: str) -> list:
+        """
+        Retorna os tickers distintos com transações registradas.
+
+        :param tabela: "transacoes_acoes" ou "transacoes_fii"
+        """
+        if tabela not in ("transacoes_acoes", "transacoes_fii"):
+            raise ValueError(f"Tabela inválida: {tabela}")
+        conn = get_db()
+        cur = conn.execute(f"SELECT DISTINCT ticker FROM {tabela}")
+        tickers = [row['ticker'] for row in cur.fetchall()]
+        conn.close()
+        return tickers
+
 def main():
     db = IndicadoresAtivosDB()
 
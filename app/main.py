@@ -1,12 +1,27 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import acoes_router, fii_router, indicadores_admin_router, indices_router, transacoes_router, carteira_router
+from app.routers import acoes_router, fii_router, indicadores_admin_router, indices_router, transacoes_router, carteira_router, metrics_router, health_router
+from app.services import cache_warmup
+from app.utils import http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Aquecimento opt-in (CACHE_WARMUP=true); /health/ready responde 503 até terminar
+    if cache_warmup.WARMUP_ENABLED:
+        cache_warmup.iniciar_em_background()
+    yield
+    await http_client.fechar_async()
+
 
 app = FastAPI(
     title="Radar Ativos API",
     description="API para análise de ações e FIIs",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Libera requisições do front-end React
@@ -25,3 +40,5 @@ app.include_router(indicadores_admin_router.router)
 app.include_router(indices_router.router)
 app.include_router(transacoes_router.router)
 app.include_router(carteira_router.router)
+app.include_router(metrics_router.router)
+app.include_router(health_router.router)
@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Query
 from app.services.acoes import Acao
 from app.services.indice_refresher import IndiceRefresher
 from app.services import score_acao
+from app.utils.upstream_errors import TickerNotFoundError
 
 router = APIRouter(prefix="/acoes", tags=["Ações"])
 
@@ -110,5 +111,7 @@ force: bool = Query(False, description="Força atualização dos dados ignorando
             "criteria_sum": int(criteria_sum),
             "comprar": bool(comprar),
         }
+    except TickerNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
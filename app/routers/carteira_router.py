@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Body
 from pydantic import BaseModel, conint
-from app.services.acoes import Acao
-from app.services.fii import FII
+from app.services.acoes import carregar_acoes
+from app.services.fii import carregar_fiis
 from app.services.score_fii import evaluate_fii
 import sqlite3
 import os
@@ -41,6 +41,9 @@ async def obter_carteira_acoes(
         if not acoes:
             return []
         
+        # Carrega todas as ações da carteira com uma única leitura em lote do cache
+        ativos = carregar_acoes([ticker for ticker, _ in acoes])
+
         resultado = []
         saldos = []
         # Primeiro loop para calcular todos os saldos
@@ -60,7 +63,7 @@ async def obter_carteira_acoes(
                     quantidade_total += qtd
                 elif tipo == 'VENDA':
                     quantidade_total -= qtd
-            acao = Acao(ticker)
+            acao = ativos[ticker]
             preco_atual = acao.cotacao
             saldo = preco_atual * quantidade
             saldos.append(saldo)
@@ -100,7 +103,7 @@ async def obter_carteira_acoes(
                     quantidade_total -= qtd
             
             # Obtém preço atual e tetos
-            acao = Acao(ticker)
+            acao = ativos[ticker]
             preco_atual = acao.cotacao
             teto_por_lucro = acao.calcular_teto_cotacao_lucro()
             teto_por_dy = acao.cotacao / acao.dy if acao.dy > 0 else None
@@ -224,6 +227,9 @@ async def obter_carteira_fii(
         if not fiis:
             return []
         
+        # Carrega todos os FIIs da carteira com uma única leitura em lote do cache
+        ativos = carregar_fiis([ticker for ticker, _ in fiis])
+
         resultado = []
         saldos = []
         # Primeiro loop para calcular todos os saldos
@@ -243,7 +249,7 @@ async def obter_carteira_fii(
                     quantidade_total += qtd
                 elif tipo == 'VENDA':
                     quantidade_total -= qtd
-            fii = FII(ticker)
+            fii = ativos[ticker]
             preco_atual = fii.cotacao
             saldo = preco_atual * quantidade
             saldos.append(saldo)
@@ -283,7 +289,7 @@ async def obter_carteira_fii(
                     quantidade_total -= qtd
             
             # Obtém preço atual e informações do FII
-            fii = FII(ticker)
+            fii = ativos[ticker]
             preco_atual = fii.cotacao
             
             # Calcula variação
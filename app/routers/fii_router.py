@@ -1,20 +1,33 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
 
-from app.services.fii import FII
+from app.services.fii import carregar_fiis_async
+from app.services.indice_refresher import IndiceRefresher
+from app.utils.upstream_errors import TickerNotFoundError, UpstreamError
 
 router = APIRouter(prefix="/fii", tags=["FII"])
 
 
 
 @router.get("/radar", summary="Obtém dados simplificados do FII para radar de oportunidades")
-def radar_fii(
+async def radar_fii(
     ticker: str = Query(..., description="Ticker do FII, ex: HGLG11"),
     force: bool = Query(False, description="Força atualização dos dados ignorando o cache")
 ):
     try:
-        fii = FII(ticker,force_update=force)
-        dados = fii.get_radar()
+        fiis, indices = await asyncio.gather(
+            carregar_fiis_async([ticker], force=force),
+            IndiceRefresher().get_indices_async(),
+        )
+        # get_radar consulta o SQLite: síncrono
+        dados = await run_in_threadpool(fiis[ticker].get_radar, indices)
         return dados
+    except TickerNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UpstreamError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services import cache_warmup
+
+router = APIRouter(prefix="/health", tags=["Saúde"])
+
+
+@router.get("", summary="Verifica se a API está no ar")
+def liveness():
+    return {"status": "ok"}
+
+
+@router.get("/ready", summary="Indica se a API está pronta (cache aquecido)")
+def readiness():
+    status_code = 200 if cache_warmup.pronto() else 503
+    return JSONResponse(status_code=status_code, content={"pronto": status_code == 200, "aquecimento": cache_warmup.estado})
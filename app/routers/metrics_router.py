@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.utils import cache_metrics
+from app.utils import redis_cache
+
+router = APIRouter(tags=["Métricas"])
+
+
+@router.get("/metrics", summary="Métricas do cache no formato Prometheus", response_class=PlainTextResponse)
+def obter_metricas():
+    try:
+        return PlainTextResponse(cache_metrics.render(redis_cache.backend), media_type="text/plain; version=0.0.4")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
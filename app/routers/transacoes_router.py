@@ -2,13 +2,27 @@ from fastapi import APIRouter, HTTPException, Query
 from datetime import datetime
 import sqlite3
 import os
-from app.services.fii import FII
+from app.services.fii import fii_valido
+from app.utils.upstream_errors import UpstreamError
 
 router = APIRouter(
     prefix="/transacoes",
     tags=["Transações"]
 )
 
+
+def _validar_fii(ticker: str):
+    """
+    Recusa tickers que não são FIIs (400). Se as fontes estão indisponíveis
+    não há como validar: responde 503 para o cliente tentar de novo.
+    """
+    try:
+        valido = fii_valido(ticker)
+    except UpstreamError as e:
+        raise HTTPException(status_code=503, detail=f"Não foi possível validar o FII agora: {e}")
+    if not valido:
+        raise HTTPException(status_code=400, detail="FII não encontrado ou ticker inválido")
+
 @router.get("/acoes/listar")
 def listar_transacoes_acoes(carteira_id: int = Query(..., description="ID da carteira")):
     """
@@ -152,10 +166,7 @@ async def adicionar_transacao_fii(
     ticker = ticker.upper()
     if not ticker.endswith('.SA'):
         ticker += '.SA'
-    fii = FII(ticker)
-        # DEBUG: print info for investigation
-    if not fii.cotacao or fii.cotacao <= 0:
-        raise HTTPException(status_code=400, detail="FII não encontrado ou ticker inválido")
+    _validar_fii(ticker)
     
     # Normaliza o tipo
     tipo = tipo.upper()
@@ -390,10 +401,7 @@ def atualizar_transacao_fii(
     ticker = ticker.upper()
     if not ticker.endswith('.SA'):
         ticker += '.SA'
-    fii = FII(ticker)
-    # DEBUG: print info for investigation
-    if not fii.cotacao or fii.cotacao <= 0:
-        raise HTTPException(status_code=400, detail="FII não encontrado ou ticker inválido")
+    _validar_fii(ticker)
 
 
     # Normalização do tipo
@@ -1 +1,5 @@
+from app.utils import fixtures
 
+# Gravação/reprodução das fontes externas (UPSTREAM_FIXTURES), antes que os
+# serviços usem o yfinance
+fixtures.instalar()
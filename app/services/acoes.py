@@ -1,71 +1,224 @@
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from functools import cached_property
 from math import sqrt
+import numpy as np
 import pandas as pd
 import yfinance as yf
-from app.utils.redis_cache import get_cached_data
-from scipy.stats import trim_mean
+from app.utils import cache_schema
+from app.utils.redis_cache import Parcial, get_cached_data, get_cached_many, gravar, ler_entradas
+from app.utils.upstream_errors import TickerNotFoundError, UpstreamError, UpstreamThrottledError, from_exception
 
-def safe_dict(df: pd.DataFrame) -> dict:
+logger = logging.getLogger(__name__)
+
+# Após esse tempo o cache é servido obsoleto e atualizado em background
+CACHE_SOFT_TTL = 12 * 60 * 60
+
+# Versão da estrutura gravada por Acao.buscar_dados; incremente ao alterá-la (ver cache_schema)
+# Versão 2: sem o histórico (adj_close), lido de historico:{ticker}
+CACHE_SCHEMA_VERSION = 2
+cache_schema.registrar("acao", CACHE_SCHEMA_VERSION, {
+    1: lambda dados: {"info": dados["info"], "income_stmt": dados["income_stmt"]},
+})
+
+# Histórico de preços mantido por ticker (historico:{ticker}) e atualizado de
+# forma incremental: só o intervalo desde o último pregão encerrado gravado é
+# baixado. A cada HIST_RESYNC_DIAS ele é baixado inteiro, para refletir ajustes
+# por dividendos e desdobramentos.
+HIST_ANOS = 5
+HIST_RESYNC_DIAS = float(os.getenv("ACAO_HIST_RESYNC_DIAS", 7))
+# Variação relativa tolerada no preço do último pregão encerrado já gravado;
+# acima disso houve ajuste retroativo e o histórico é baixado inteiro antes do prazo
+HIST_TOLERANCIA_AJUSTE = 1e-4
+# Versão 2: colunas na ordem de COLUNAS_HISTORICO (a 1 podia ter Open primeiro)
+HIST_SCHEMA_VERSION = 2
+cache_schema.registrar("historico", HIST_SCHEMA_VERSION, {
+    1: lambda entrada: {**entrada, "adj_close": _ordenar_colunas(_frame(entrada["adj_close"]))},
+})
+
+# Partes da busca no Yahoo (info, DRE, histórico) executadas em paralelo, cada
+# uma com no máximo FETCH_TIMEOUT segundos
+FETCH_TIMEOUT = float(os.getenv("ACAO_FETCH_TIMEOUT", 20))
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ACAO_FETCH_WORKERS", 16)),
+    thread_name_prefix="acao-fetch",
+)
+
+def safe_frame(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Garante que colunas e índices sejam serializáveis como JSON.
-    Converte Timestamp e colunas em string.
+    Garante colunas e índices em string e valores float64, para gravação como Arrow.
     """
     df = df.copy()
     df.columns = df.columns.map(str)
     df.index = df.index.map(str)
-    return df.to_dict(orient="index")
+    return df.apply(pd.to_numeric, errors="coerce").astype("float64")
+
+
+# Ordem das colunas do histórico. O yf.download agrupado por ticker devolve
+# Open primeiro; agrupado por coluna, Adj Close
+COLUNAS_HISTORICO = ["Adj Close", "Close", "Open", "High", "Low", "Volume"]
+
+
+def _ordenar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """Reordena as colunas do histórico conforme COLUNAS_HISTORICO; outras colunas vão ao fim."""
+    colunas = [c for c in COLUNAS_HISTORICO if c in df.columns]
+    return df[colunas + [c for c in df.columns if c not in colunas]]
+
+
+def historico_precos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza o retorno do yf.download: colunas simples na ordem de
+    COLUNAS_HISTORICO (Adj Close, Close, ...), índice DatetimeIndex e valores float64.
+    """
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.columns = df.columns.map(str)
+    df.index = pd.to_datetime(df.index)
+    return _ordenar_colunas(df).astype("float64")
+
+
+def _frame(valor) -> pd.DataFrame:
+    """Aceita o DataFrame do cache ou o dict-of-dicts de entradas antigas."""
+    if isinstance(valor, pd.DataFrame):
+        return valor
+    return pd.DataFrame.from_dict(valor, orient="index")
 
 
 class Acao:
-    def __init__(self, ticker: str, force: bool = False):
+    def __init__(
+        self, ticker: str, force: bool = False, dados: dict | None = None, adj_close: pd.DataFrame | None = None
+    ):
+        """
+        :param ticker: Ticker da ação, ex: "VALE3.SA"
+        :param force: Se True, força atualização do cache
+        :param dados: Dados já carregados do cache (ver carregar_acoes); evita nova leitura
+        :param adj_close: Histórico já carregado (ver ler_historicos); se ausente é lido de historico:{ticker}
+        """
         self.ticker = ticker.upper()
 
-        dados = get_cached_data(
-            f"acao:{self.ticker}",
-            None,
-            lambda: {
-                "info": yf.Ticker(self.ticker).info,
-                "income_stmt": safe_dict(yf.Ticker(self.ticker).income_stmt),
-                "adj_close": safe_dict(yf.download(self.ticker, period="5y", progress=False, auto_adjust=False))
-            },
-            force=force
-        )
+        if dados is None:
+            dados = get_cached_data(
+                self.cache_key(self.ticker),
+                None,
+                lambda: self.buscar_dados(self.ticker),
+                force=force,
+                soft_ttl=CACHE_SOFT_TTL,
+            )
+
+        if adj_close is None:
+            adj_close = ler_historicos([self.ticker]).get(self.ticker, pd.DataFrame())
+        if isinstance(adj_close, UpstreamError):
+            raise adj_close
 
         self.info = dados["info"]
-        self.income_stmt = pd.DataFrame.from_dict(dados["income_stmt"], orient="index")
-        self.adj_close = pd.DataFrame.from_dict(dados["adj_close"], orient="index")
+        self.income_stmt = _frame(dados["income_stmt"])
+        self.adj_close = adj_close
 
-    def media_ponderada_fechamento(self, ano: int) -> float | None:
-        #return trim_mean(self.adj_close.loc[f"{ano}-"].tail(30).values, proportiontocut=0.1)
-        mask = pd.to_datetime(self.adj_close.index).year == ano
-      
-        return trim_mean(self.adj_close.loc[mask].tail(30).values, proportiontocut=0.1)
+    @staticmethod
+    def cache_key(ticker: str) -> str:
+        return f"acao:{ticker.upper()}"
 
+    @staticmethod
+    def buscar_dados(ticker: str, adj_close: pd.DataFrame | None = None) -> dict | Parcial:
+        """
+        Busca info e DRE no Yahoo Finance e atualiza o histórico de 5 anos
+        (gravado à parte, em historico:{ticker}), em paralelo e com um único
+        yf.Ticker. O histórico é obrigatório; se info ou DRE falharem ou
+        excederem FETCH_TIMEOUT, retorna um resultado Parcial.
 
-    def calcular_teto_cotacao_lucro(self) -> float | None:
-        income = self.income_stmt.loc['Net Income'].dropna().tail(5)
-        # print("income:", income)
-        datas = list(pd.to_datetime(income.index).year)
-        # print("datas:", datas)
-        lucros = list(income.values)
-        # print("lucros:", lucros)
-        cotacoes = [self.media_ponderada_fechamento(ano) for ano in datas]
-        # print("cotacoes:", cotacoes)
-        datas, lucros, cotacoes = datas[::-1], lucros[::-1], cotacoes[::-1]
+        :param adj_close: Histórico já atualizado (ver atualizar_historicos); se ausente é atualizado aqui
+        """
+        ticker = ticker.upper()
+        if isinstance(adj_close, UpstreamError):
+            raise adj_close
+        yf_ticker = yf.Ticker(ticker)
+        partes = {
+            "info": lambda: yf_ticker.info,
+            "income_stmt": lambda: safe_frame(yf_ticker.income_stmt),
+        }
+        if adj_close is None or adj_close.empty:
+            partes["adj_close"] = lambda: atualizar_historicos([ticker]).get(ticker, pd.DataFrame())
+        futures = {parte: _fetch_executor.submit(fn) for parte, fn in partes.items()}
 
-        try:
-            income = self.income_stmt.loc['Net Income'].dropna().tail(5)
-            datas = list(pd.to_datetime(income.index).year)
-            lucros = list(income.values)
-            cotacoes = [float(self.media_ponderada_fechamento(ano)[0]) for ano in datas]
-            datas, lucros, cotacoes = datas[::-1], lucros[::-1], cotacoes[::-1]
+        dados = {"info": {}, "income_stmt": pd.DataFrame(), "adj_close": adj_close}
+        faltando = []
+        deadline = time.monotonic() + FETCH_TIMEOUT
+        for parte, future in futures.items():
+            try:
+                dados[parte] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FuturesTimeout:
+                if parte == "adj_close":
+                    raise UpstreamError(f"yahoo: timeout ao baixar o histórico de {ticker}", "yahoo")
+                logger.warning("Timeout ao buscar %s de %s", parte, ticker)
+                faltando.append(parte)
+            except Exception as e:
+                erro = from_exception(e, "yahoo")
+                if erro is None:
+                    raise
+                if parte == "adj_close":
+                    raise erro from e
+                logger.warning("Falha ao buscar %s de %s: %s", parte, ticker, erro)
+                faltando.append(parte)
 
-  
+        adj_close = dados.pop("adj_close")
+        if isinstance(adj_close, UpstreamError):
+            raise adj_close
+        if adj_close.empty:
+            raise TickerNotFoundError(f"yahoo: sem cotações para {ticker}", "yahoo")
+        return Parcial(dados, faltando) if faltando else dados
 
+    @cached_property
+    def _medias_fechamento_anuais(self) -> pd.Series:
+        """
+        Média aparada (10% em cada ponta, como scipy.stats.trim_mean) dos
+        últimos 30 fechamentos ajustados de cada ano, indexada pelo ano.
+        Calculada de uma vez para todos os anos.
+        """
+        coluna = "Adj Close" if "Adj Close" in self.adj_close.columns else "Close"
+        fechamento = self.adj_close[coluna].dropna().sort_index()
+        anos = fechamento.index.year.to_numpy()
+        valores = fechamento.to_numpy(dtype="float64")
+
+        # Últimos 30 pregões de cada ano (posição contada a partir do fim do ano)
+        ultimos = np.searchsorted(anos, anos, side="right") - np.arange(len(anos)) <= 30
+        anos, valores = anos[ultimos], valores[ultimos]
+
+        # Ordena cada ano pelos valores e descarta 10% de cada ponta
+        ordem = np.lexsort((valores, anos))
+        anos, valores = anos[ordem], valores[ordem]
+        unicos, inicio, tamanho = np.unique(anos, return_index=True, return_counts=True)
+        corte = (tamanho * 0.1).astype(int)
+        grupo = np.repeat(np.arange(len(unicos)), tamanho)
+        posicao = np.arange(len(anos)) - inicio[grupo]
+        mantidos = (posicao >= corte[grupo]) & (posicao < (tamanho - corte)[grupo])
+        soma = np.bincount(grupo[mantidos], weights=valores[mantidos], minlength=len(unicos))
+        return pd.Series(soma / (tamanho - 2 * corte), index=unicos)
+
+    def media_ponderada_fechamento(self, ano: int) -> float | None:
+        media = self._medias_fechamento_anuais.get(ano)
+        return float(media) if media is not None else None
+
+    def calcular_teto_cotacao_lucro(self) -> float | None:
+        """Teto pela relação lucro x cotação dos últimos 5 anos (calculado uma vez por instância)."""
+        return self._teto_cotacao_lucro
+
+    @cached_property
+    def _teto_cotacao_lucro(self) -> float | None:
+        try:
+            # Do ano mais antigo ao mais recente
+            income = self.income_stmt.loc['Net Income'].dropna().tail(5)[::-1]
+            anos = pd.to_datetime(income.index).year
             df = pd.DataFrame({
-                "Ano": datas,
-                "Lucro Liquido": lucros,
-                "Cotacao": cotacoes,
-            })
+                "Lucro Liquido": income.to_numpy(dtype="float64"),
+                "Cotacao": self._medias_fechamento_anuais.reindex(anos).to_numpy(),
+            }, index=anos)
+            if df["Cotacao"].isna().any():
+                # Histórico não cobre algum dos anos
+                return None
 
             ultimo_lucro = df["Lucro Liquido"].iloc[-1]
             min_cot = df["Cotacao"].min()
@@ -152,6 +305,239 @@ class Acao:
     def lpa(self) -> float | None: return self.info.get('trailingEps')
 
 
+class _FalhasDownload(logging.Handler):
+    """
+    Coleta as falhas por ticker do yf.download, que não lança exceções: ele
+    as registra no log do yfinance como "['VALE3.SA', ...]: <erro>".
+    """
+
+    def __init__(self, tickers: list[str]):
+        super().__init__(logging.ERROR)
+        self.tickers = set(tickers)
+        self.falhas = {}
+
+    def emit(self, record):
+        simbolos, separador, erro = record.getMessage().partition("]: ")
+        if not separador or not simbolos.startswith("["):
+            return
+        for simbolo in re.findall(r"'([^']+)'", simbolos):
+            if simbolo in self.tickers:
+                self.falhas[simbolo] = erro
+
+
+# Mensagens do yfinance para ticker sem cotações (YFTickerMissingError e derivadas)
+_TICKER_AUSENTE = re.compile(r"delisted|no timezone found|no price data found|YF\w*MissingError", re.IGNORECASE)
+
+
+def _classificar_falha(ticker: str, erro: str) -> UpstreamError:
+    mensagem = f"yahoo: {ticker}: {erro}"
+    if "YFRateLimitError" in erro or "Too Many Requests" in erro:
+        return UpstreamThrottledError(mensagem, "yahoo")
+    if _TICKER_AUSENTE.search(erro):
+        return TickerNotFoundError(mensagem, "yahoo")
+    return UpstreamError(mensagem, "yahoo")
+
+
+def baixar_historicos(
+    tickers: list[str], inicio: pd.Timestamp | None = None
+) -> dict[str, pd.DataFrame | UpstreamError]:
+    """
+    Baixa o histórico de vários tickers em uma única chamada ao yf.download e
+    o divide por ticker. Tickers sem cotações ficam de fora; os que falharam
+    por outro motivo (limite de requisições, rede) recebem o UpstreamError.
+
+    :param tickers: Tickers das ações, ex: ["VALE3.SA", "ITSA4.SA"]
+    :param inicio: Primeira data a baixar; se ausente, baixa HIST_ANOS anos
+    :return: Dicionário ticker (maiúsculo) -> histórico no formato de historico_precos ou a falha
+    """
+    tickers = sorted({ticker.upper() for ticker in tickers})
+    if not tickers:
+        return {}
+    periodo = {"start": inicio.strftime("%Y-%m-%d")} if inicio is not None else {"period": f"{HIST_ANOS}y"}
+    falhas = _FalhasDownload(tickers)
+    yf_logger = logging.getLogger("yfinance")
+    yf_logger.addHandler(falhas)
+    try:
+        df = yf.download(tickers, **periodo, progress=False, auto_adjust=False, group_by="ticker", threads=True)
+    finally:
+        yf_logger.removeHandler(falhas)
+
+    historicos = {}
+    for ticker in tickers:
+        parte = None
+        if isinstance(df.columns, pd.MultiIndex):
+            if ticker in df.columns.get_level_values(0):
+                parte = df[ticker]
+        else:
+            parte = df
+        # O índice é a união das datas de todos os tickers
+        if parte is not None:
+            parte = parte.dropna(how="all")
+        if parte is not None and not parte.empty:
+            historicos[ticker] = historico_precos(parte)
+        elif ticker in falhas.falhas:
+            erro = _classificar_falha(ticker, falhas.falhas[ticker])
+            if not isinstance(erro, TickerNotFoundError):
+                historicos[ticker] = erro
+    return historicos
+
+
+def historico_key(ticker: str) -> str:
+    return f"historico:{ticker.upper()}"
+
+
+def _historico_gravado(entrada: dict) -> pd.DataFrame:
+    historico = _frame(entrada["adj_close"])
+    if not isinstance(historico.index, pd.DatetimeIndex):
+        historico = historico.set_axis(pd.to_datetime(historico.index))
+    return historico
+
+
+def _referencia(antigo: pd.DataFrame) -> pd.Timestamp:
+    """
+    Último pregão encerrado do histórico gravado: o penúltimo, pois o último
+    pode ter sido gravado com a cotação do pregão em andamento.
+    """
+    datas = antigo.index.sort_values()
+    return datas[-2] if len(datas) > 1 else datas[-1]
+
+
+def _ajustado(antigo: pd.DataFrame, novo: pd.DataFrame) -> bool:
+    """Indica se o preço do último pregão encerrado gravado mudou no download novo (ajuste retroativo)."""
+    data = _referencia(antigo)
+    if data not in novo.index:
+        return False
+    for coluna in ("Adj Close", "Close"):
+        if coluna in antigo.columns and coluna in novo.columns:
+            anterior, atual = antigo.at[data, coluna], novo.at[data, coluna]
+            if pd.notna(anterior) and pd.notna(atual) and abs(atual - anterior) > HIST_TOLERANCIA_AJUSTE * abs(anterior):
+                return True
+    return False
+
+
+def _mesclar(antigo: pd.DataFrame, novo: pd.DataFrame) -> pd.DataFrame:
+    """Acrescenta os pregões novos (substituindo os já gravados a partir do primeiro deles) e descarta os além de HIST_ANOS."""
+    df = _ordenar_colunas(pd.concat([antigo[antigo.index < novo.index.min()], novo]))
+    return df[df.index > df.index.max() - pd.DateOffset(years=HIST_ANOS)]
+
+
+def atualizar_historicos(tickers: list[str], completo: bool = False) -> dict[str, pd.DataFrame]:
+    """
+    Atualiza o histórico de preços de vários tickers baixando apenas o
+    intervalo desde o último pregão encerrado gravado, em uma única chamada;
+    o último pregão gravado é sempre substituído. Históricos
+    sem download completo há HIST_RESYNC_DIAS, ou com ajuste retroativo
+    detectado, são baixados inteiros.
+
+    :param tickers: Tickers das ações, ex: ["VALE3.SA", "ITSA4.SA"]
+    :param completo: Se True, baixa o histórico inteiro de todos
+    :return: Dicionário ticker (maiúsculo) -> histórico ou a falha do download (ver
+             baixar_historicos). Tickers sem cotações ficam de fora
+    """
+    tickers = sorted({ticker.upper() for ticker in tickers})
+    gravados = {} if completo else ler_entradas([historico_key(ticker) for ticker in tickers])
+    agora = time.time()
+
+    incrementais = {}
+    for ticker in tickers:
+        entrada = gravados.get(historico_key(ticker))
+        if entrada is None or agora - entrada["sincronizado_em"] >= HIST_RESYNC_DIAS * 86400:
+            continue
+        antigo = _historico_gravado(entrada)
+        if not antigo.empty:
+            incrementais[ticker] = (antigo, entrada["sincronizado_em"])
+    completos = [ticker for ticker in tickers if ticker not in incrementais]
+
+    historicos = {}
+    if incrementais:
+        # Baixa a partir do último pregão encerrado gravado (inclusive), que serve de conferência
+        inicio = min(_referencia(antigo) for antigo, _ in incrementais.values())
+        novos = baixar_historicos(list(incrementais), inicio=inicio)
+        for ticker, (antigo, sincronizado_em) in incrementais.items():
+            novo = novos.get(ticker)
+            if novo is None or isinstance(novo, UpstreamError) or novo.empty:
+                historicos[ticker] = antigo
+            elif _ajustado(antigo, novo):
+                logger.info("Ajuste retroativo no histórico de %s; baixando-o inteiro", ticker)
+                completos.append(ticker)
+            else:
+                historicos[ticker] = _mesclar(antigo, novo)
+                gravar(historico_key(ticker), {"adj_close": historicos[ticker], "sincronizado_em": sincronizado_em})
+        logger.debug("Histórico incremental desde %s: %s", inicio.date(), ", ".join(incrementais))
+
+    if completos:
+        for ticker, df in baixar_historicos(completos).items():
+            historicos[ticker] = df
+            if not isinstance(df, UpstreamError):
+                gravar(historico_key(ticker), {"adj_close": df, "sincronizado_em": agora})
+    return historicos
+
+
+def ler_historicos(tickers: list[str]) -> dict[str, pd.DataFrame | UpstreamError]:
+    """
+    Lê os históricos gravados (historico:{ticker}) em lote; os ausentes são
+    baixados (ver atualizar_historicos).
+
+    :return: Dicionário ticker (maiúsculo) -> histórico ou a falha do download.
+             Tickers sem cotações ficam de fora
+    """
+    tickers = sorted({ticker.upper() for ticker in tickers})
+    entradas = ler_entradas([historico_key(ticker) for ticker in tickers])
+    historicos = {
+        ticker: _historico_gravado(entradas[historico_key(ticker)])
+        for ticker in tickers
+        if historico_key(ticker) in entradas
+    }
+    faltando = [ticker for ticker in tickers if ticker not in historicos]
+    if faltando:
+        historicos.update(atualizar_historicos(faltando))
+    return historicos
+
+
+def carregar_dados_acoes(tickers: list[str], force: bool = False, return_exceptions: bool = False) -> dict:
+    """
+    Lê os dados de várias ações do cache em lote. Os históricos das ausentes
+    são atualizados em uma única chamada (atualizar_historicos); info e DRE são
+    buscados por ticker, em paralelo.
+
+    :param return_exceptions: Se True, falhas da origem são devolvidas como valor
+    :return: Dicionário ticker (como recebido) -> dados de Acao.buscar_dados
+    """
+    chaves = {ticker: Acao.cache_key(ticker) for ticker in tickers}
+    por_chave = {chave: ticker.upper() for ticker, chave in chaves.items()}
+    historicos = {}
+
+    def prefetch(keys):
+        historicos.update(atualizar_historicos([por_chave[key] for key in keys]))
+
+    dados = get_cached_many(
+        list(chaves.values()),
+        lambda key: Acao.buscar_dados(por_chave[key], historicos.get(por_chave[key])),
+        force=force,
+        soft_ttl=CACHE_SOFT_TTL,
+        return_exceptions=return_exceptions,
+        prefetch_fn=prefetch,
+    )
+    return {ticker: dados[chave] for ticker, chave in chaves.items()}
+
+
+def carregar_acoes(tickers: list[str], force: bool = False) -> dict[str, Acao]:
+    """
+    Carrega várias ações com uma leitura em lote dos dados e outra dos
+    históricos, buscando na origem apenas os ausentes (ver carregar_dados_acoes).
+
+    :param tickers: Tickers das ações
+    :param force: Se True, força atualização de todas
+    :return: Dicionário ticker (como recebido) -> Acao
+    """
+    dados = carregar_dados_acoes(tickers, force=force)
+    historicos = ler_historicos(tickers)
+    return {
+        ticker: Acao(ticker, dados=dados[ticker], adj_close=historicos.get(ticker.upper(), pd.DataFrame()))
+        for ticker in tickers
+    }
+
+
 def main():
     ativo = Acao("VALE3.SA")
     
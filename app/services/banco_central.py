@@ -1,28 +1,48 @@
+import asyncio
 import json
+import os
 from datetime import datetime
 
 import pandas as pd
-import requests
+
+from app.db.banco_central_db import SeriesBancoCentralDB
+from app.utils import http_client
+from app.utils.upstream_errors import raise_for_status
+
+
+# Após uma sincronização, a série local é usada sem consultar o Banco Central
+# por esse tempo (s); evita nova requisição quando a mesma série é lida por
+# mais de uma janela (ex: IPCA de 5 anos e de 1 ano)
+SYNC_INTERVALO = int(os.getenv("BCB_SYNC_INTERVALO", 3600))
+
+# Diferença máxima (dias) entre o início da janela e o primeiro ponto gravado
+# para considerar a janela coberta (séries mensais têm um ponto por mês)
+FOLGA_INICIO = 35
 
 
 class Indices:
     """
     Classe base para buscar e tratar séries históricas de índices do Banco Central do Brasil.
+
+    As séries ficam gravadas no SQLite (series_banco_central) e a cada leitura
+    apenas os pontos desde a última data gravada são baixados.
     """
 
     def __init__(self, anos_hist: int):
         self.anos_hist = anos_hist
         self.df = None
 
-    def get_url(self, codigo_serie: int) -> str:
+    def get_url(self, codigo_serie: int, inicio: datetime | None = None) -> str:
         """
         Gera a URL de consulta na API do Banco Central.
 
         :param codigo_serie: Código da série do Banco Central
+        :param inicio: Data inicial; por padrão, o início da janela de anos_hist anos
         :return: URL formatada para requisição
         """
-        ontem = datetime.now() - pd.Timedelta(days=1)
-        data_inicio = f"{ontem.day}/{ontem.month}/{ontem.year - self.anos_hist}"
+        janela_inicio, ontem = self._janela()
+        inicio = inicio or janela_inicio
+        data_inicio = f"{inicio.day}/{inicio.month}/{inicio.year}"
         data_final = f"{ontem.day}/{ontem.month}/{ontem.year}"
         url = (
             f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo_serie}/dados?"
@@ -30,28 +50,87 @@ class Indices:
         )
         return url
 
+    def _janela(self) -> tuple[pd.Timestamp, pd.Timestamp]:
+        """Início e fim (ontem) da janela de anos_hist anos."""
+        ontem = pd.Timestamp(datetime.now().date()) - pd.Timedelta(days=1)
+        return ontem - pd.DateOffset(years=self.anos_hist), ontem
+
+    def _inicio_sync(self, codigo_serie: int) -> pd.Timestamp | None:
+        """
+        Primeira data a baixar para completar a série local: o início da janela
+        se ela não está coberta, senão a última data gravada (que pode ter sido
+        revisada). None se a série foi sincronizada há menos de SYNC_INTERVALO.
+        """
+        inicio, _ = self._janela()
+        primeira, ultima, sincronizado_em = SeriesBancoCentralDB().get_intervalo(codigo_serie)
+        if primeira is None or pd.Timestamp(primeira) > inicio + pd.Timedelta(days=FOLGA_INICIO):
+            return inicio
+        if sincronizado_em and (datetime.now() - datetime.fromisoformat(sincronizado_em)).total_seconds() < SYNC_INTERVALO:
+            return None
+        return pd.Timestamp(ultima)
+
+    @staticmethod
+    def _gravar(codigo_serie: int, response):
+        """Grava os pontos baixados. 404 indica que não há pontos no intervalo."""
+        if response.status_code == 404:
+            pontos = []
+        else:
+            pontos = [
+                (datetime.strptime(p["data"], "%d/%m/%Y").strftime("%Y-%m-%d"), float(str(p["valor"]).replace(",", ".")))
+                for p in json.loads(response.text)
+            ]
+        SeriesBancoCentralDB().save_serie(codigo_serie, pontos)
+
+    def _ler_local(self, codigo_serie: int, indice: str) -> pd.DataFrame:
+        """Série da janela de anos_hist anos a partir do SQLite."""
+        inicio, fim = self._janela()
+        pontos = SeriesBancoCentralDB().get_serie(codigo_serie, inicio.strftime("%Y-%m-%d"), fim.strftime("%Y-%m-%d"))
+        df = pd.DataFrame(pontos, columns=["date", indice])
+        df["date"] = pd.to_datetime(df["date"])
+        df.set_index('date', inplace=True)
+        return df
+
     def parse(self, codigo_serie: int, indice: str) -> pd.DataFrame:
         """
-        Faz a requisição e parse da série histórica.
+        Sincroniza a série com o Banco Central e a retorna a partir do SQLite.
 
         :param codigo_serie: Código da série no Banco Central
         :param indice: Nome da coluna que será atribuída no DataFrame
         :return: DataFrame tratado
         """
         if self.df is None:
-            url = self.get_url(codigo_serie)
-            response = requests.get(url)
-            response.raise_for_status()
-            data = json.loads(response.text)
-            df = pd.DataFrame(data)
-            df.rename(columns={"data": "date"}, inplace=True)
-            df["date"] = pd.to_datetime(df["date"], format='%d/%m/%Y')
-            df.set_index('date', inplace=True)
-            df["valor"] = df["valor"].str.replace(',', '.').astype(float)
-            df.rename(columns={"valor": indice}, inplace=True)
-            self.df = df
+            inicio = self._inicio_sync(codigo_serie)
+            if inicio is not None:
+                response = http_client.get(self.get_url(codigo_serie, inicio))
+                if response.status_code != 404:
+                    raise_for_status(response, "bcb")
+                self._gravar(codigo_serie, response)
+            self.df = self._ler_local(codigo_serie, indice)
         return self.df
 
+    async def parse_async(self, codigo_serie: int, indice: str) -> pd.DataFrame:
+        """
+        Versão assíncrona de parse. Depois dela, os métodos síncronos
+        (media_anual, atual, ...) usam a série já carregada.
+
+        :param codigo_serie: Código da série no Banco Central
+        :param indice: Nome da coluna que será atribuída no DataFrame
+        :return: DataFrame tratado
+        """
+        if self.df is None:
+            inicio = await asyncio.to_thread(self._inicio_sync, codigo_serie)
+            if inicio is not None:
+                response = await http_client.aget(self.get_url(codigo_serie, inicio))
+                if response.status_code != 404:
+                    raise_for_status(response, "bcb")
+                await asyncio.to_thread(self._gravar, codigo_serie, response)
+            self.df = await asyncio.to_thread(self._ler_local, codigo_serie, indice)
+        return self.df
+
+    async def carregar_async(self) -> pd.DataFrame:
+        """Carrega a série da subclasse (codigo_serie/indice) de forma assíncrona."""
+        return await self.parse_async(self.codigo_serie, self.indice)
+
 
 class SELIC(Indices):
     """
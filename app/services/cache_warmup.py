@@ -0,0 +1,171 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.db.indicadores_ativos_db import IndicadoresAtivosDB
+from app.services.acoes import carregar_dados_acoes
+from app.services.fii import fontes_fii
+from app.services.fii_yf import CACHE_SOFT_TTL as FII_SOFT_TTL
+from app.services.indice_refresher import IndiceRefresher
+from app.utils.redis_cache import get_cached_data
+from app.utils.upstream_errors import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+# Aquecimento do cache na inicialização da API (opt-in) e buscas simultâneas na origem
+WARMUP_ENABLED = os.getenv("CACHE_WARMUP", "false").lower() in ("1", "true", "yes")
+WARMUP_WORKERS = int(os.getenv("CACHE_WARMUP_WORKERS", 8))
+# Ações por download em lote do histórico de preços
+WARMUP_LOTE_ACOES = int(os.getenv("CACHE_WARMUP_LOTE_ACOES", 50))
+
+# Tipo das ações na tabela `ativos`; os demais tipos são categorias de FII
+TIPO_ACOES = "acoes"
+
+_lock = threading.Lock()
+estado = {
+    "status": "pendente" if WARMUP_ENABLED else "desativado",
+    "total": 0,
+    "concluidas": 0,
+    "erros": 0,
+    "inicio": None,
+    "duracao": None,
+}
+
+
+def pronto() -> bool:
+    """
+    Indica se a API pode receber tráfego: cache aquecido ou aquecimento
+    desativado. Uma falha no aquecimento não impede a API de ficar pronta.
+    """
+    return estado["status"] in ("concluido", "desativado", "falhou")
+
+
+def _normalizar(ticker: str) -> str:
+    ticker = ticker.strip().upper()
+    return ticker if ticker.endswith(".SA") else ticker + ".SA"
+
+
+def tickers_para_aquecer() -> tuple[list[str], list[str]]:
+    """
+    Tickers cadastrados na tabela `ativos` mais os que possuem transações.
+
+    :return: (ações, FIIs), já com o sufixo ".SA"
+    """
+    db = IndicadoresAtivosDB()
+    acoes, fiis = set(), set()
+    for ticker, tipo in db.get_ativos().items():
+        (acoes if tipo == TIPO_ACOES else fiis).add(_normalizar(ticker))
+    acoes.update(_normalizar(t) for t in db.get_tickers_transacionados("transacoes_acoes"))
+    fiis.update(_normalizar(t) for t in db.get_tickers_transacionados("transacoes_fii"))
+    return sorted(acoes), sorted(fiis)
+
+
+def _entradas_fiis(fiis: list[str]) -> list[tuple[str, object]]:
+    """Lista (chave, busca) de cada fonte dos FIIs."""
+    return [entrada for ticker in fiis for entrada in fontes_fii(ticker).values()]
+
+
+def _atualizar(**valores):
+    with _lock:
+        estado.update(valores)
+
+
+def _progresso(concluidas: int, erros: int = 0):
+    with _lock:
+        anterior = estado["concluidas"] / estado["total"]
+        estado["concluidas"] += concluidas
+        estado["erros"] += erros
+        atual = estado["concluidas"] / estado["total"]
+    # Registra a cada 10% concluídos
+    if int(atual * 10) > int(anterior * 10):
+        logger.info("Aquecimento do cache: %d/%d (%.0f%%)", estado["concluidas"], estado["total"], atual * 100)
+
+
+def aquecer_cache(force: bool = False, max_workers: int = WARMUP_WORKERS) -> dict:
+    """
+    Preenche o cache de ações (acao:) e FIIs (fii_yf:, fiiscom:, investidor10:)
+    de todos os tickers conhecidos, além dos índices do Banco Central.
+
+    Entradas já em cache são apenas lidas; as ausentes são buscadas com no
+    máximo `max_workers` buscas simultâneas, e o histórico de preços das ações
+    é baixado em lotes de WARMUP_LOTE_ACOES. Com vários workers, o single-flight
+    do cache garante que cada entrada seja buscada na origem uma única vez.
+
+    :param force: Se True, atualiza todas as entradas na origem
+    :param max_workers: Máximo de buscas simultâneas
+    :return: Estado final (total, concluidas, erros, duracao)
+    """
+    inicio = time.monotonic()
+    _atualizar(status="executando", inicio=time.strftime("%Y-%m-%d %H:%M:%S"), concluidas=0, erros=0)
+    try:
+        acoes, fiis = tickers_para_aquecer()
+        entradas = _entradas_fiis(fiis)
+        _atualizar(total=len(acoes) + len(entradas) + 1)
+        logger.info("Aquecendo cache: %d ações, %d FIIs, %d entradas",
+                    len(acoes), len(fiis), len(acoes) + len(entradas))
+
+        try:
+            IndiceRefresher().get_indices()
+            _progresso(1)
+        except Exception as e:
+            logger.warning("Erro ao aquecer os índices: %s", e)
+            _progresso(1, erros=1)
+
+        # Ações em lotes: um único download do histórico de preços por lote
+        for i in range(0, len(acoes), WARMUP_LOTE_ACOES):
+            lote = acoes[i:i + WARMUP_LOTE_ACOES]
+            try:
+                dados = carregar_dados_acoes(lote, force=force, return_exceptions=True)
+                erros = sum(isinstance(valor, Exception) for valor in dados.values())
+            except Exception as e:
+                logger.warning("Erro ao aquecer as ações %s: %s", ", ".join(lote), e)
+                erros = len(lote)
+            _progresso(len(lote), erros)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="cache-warmup") as pool:
+            futures = {
+                pool.submit(get_cached_data, chave, None, buscar, force=force, soft_ttl=FII_SOFT_TTL): chave
+                for chave, buscar in entradas
+            }
+            for future in as_completed(futures):
+                erro = future.exception()
+                if erro is not None and not isinstance(erro, UpstreamError):
+                    logger.warning("Erro ao aquecer %s: %s", futures[future], erro)
+                _progresso(1, erros=int(erro is not None))
+    except Exception:
+        _atualizar(status="falhou", duracao=round(time.monotonic() - inicio, 2))
+        raise
+
+    _atualizar(status="concluido", duracao=round(time.monotonic() - inicio, 2))
+    logger.info("Cache aquecido em %.1fs (%d erros)", estado["duracao"], estado["erros"])
+    return dict(estado)
+
+
+def iniciar_em_background():
+    """Executa o aquecimento em uma thread, sem bloquear a inicialização da API."""
+    def executar():
+        try:
+            aquecer_cache()
+        except Exception as e:
+            logger.error("Falha no aquecimento do cache: %s", e)
+
+    threading.Thread(target=executar, name="cache-warmup", daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aquece o cache com todos os ativos cadastrados")
+    parser.add_argument("--force", action="store_true", help="Atualiza todas as entradas na origem")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS, help="Buscas simultâneas")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    resultado = aquecer_cache(force=args.force, max_workers=args.workers)
+    print(f"{resultado['concluidas']}/{resultado['total']} entradas em {resultado['duracao']}s, "
+          f"{resultado['erros']} erros")
+
+
+if __name__ == "__main__":
+    main()
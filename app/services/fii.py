@@ -1,22 +1,91 @@
+import asyncio
+import logging
+import os
 from datetime import datetime
+from functools import cached_property, partial
 
 
 from app.db.indicadores_ativos_db import IndicadoresAtivosDB
-from app.services.fii_yf import FIIYahooService
+from app.services.fii_yf import CACHE_SOFT_TTL, FIIYahooService
 from app.services.fiiscom import FiisComService
 from app.services.indice_refresher import IndiceRefresher
 from app.services.investidor10 import Investidor10Service
+from app.utils import cache_metrics as metrics
+from app.utils import circuit_breaker
+from app.utils.redis_cache import get_cached_data_async, get_cached_many
+from app.utils.upstream_errors import TickerNotFoundError, UpstreamError
+
+logger = logging.getLogger(__name__)
 
 
 
 
 class FII:
-    def __init__(self, ticker, force_update=False):
+    def __init__(self, ticker, force_update=False, dados: dict | None = None, prefetch: bool = False):
+        """
+        Cada fonte (Yahoo, fiis.com.br, Investidor10) é carregada no primeiro
+        acesso a uma propriedade que dependa dela.
+
+        :param ticker: Ticker do FII, ex: "HGLG11.SA"
+        :param force_update: Se True, força atualização do cache das fontes
+        :param dados: Dados já carregados por fonte ("yf", "fiiscom", "i10"), ver carregar_fiis
+        :param prefetch: Se True, carrega já as três fontes, buscando as ausentes em
+                         paralelo. Use quando todas serão consultadas (ex: radar)
+        """
         self.ticker = ticker.upper()
         self.ticker_base = self.ticker.split(".")[0]
-        self.yf = FIIYahooService(self.ticker, force=force_update)
-        self.fiiscom = FiisComService(self.ticker_base, force=force_update)
-        self.i10 = Investidor10Service(self.ticker_base, force=force_update)
+        self.force_update = force_update
+        self._dados = dict(dados or {})
+        self._erros = []
+        if prefetch:
+            faltando = [fonte for fonte in FONTES if fonte not in self._dados]
+            if faltando:
+                buscados = _dados_fiis([self.ticker], force=force_update)[self.ticker]
+                self._dados.update({fonte: buscados[fonte] for fonte in faltando})
+            # Instancia as três fontes: falha aqui se nenhuma responder
+            self.yf, self.fiiscom, self.i10
+
+    @cached_property
+    def yf(self) -> FIIYahooService:
+        return self._carregar(
+            "yf",
+            lambda data: FIIYahooService(self.ticker, force=self.force_update, data=data),
+            FIIYahooService.DADOS_VAZIOS,
+        )
+
+    @cached_property
+    def fiiscom(self) -> FiisComService:
+        return self._carregar(
+            "fiiscom",
+            lambda data: FiisComService(self.ticker_base, force=self.force_update, dados=data),
+            FiisComService.DADOS_VAZIOS,
+        )
+
+    @cached_property
+    def i10(self) -> Investidor10Service:
+        return self._carregar(
+            "i10",
+            lambda campos: Investidor10Service(self.ticker_base, force=self.force_update, campos=campos),
+            Investidor10Service.DADOS_VAZIOS,
+        )
+
+    def _carregar(self, fonte, criar, vazio):
+        """
+        Cria o serviço de uma fonte. Se a fonte falhar, registra o erro e usa
+        dados vazios para que as propriedades recorram às demais fontes.
+        """
+        dados = self._dados.pop(fonte, None)
+        try:
+            if isinstance(dados, UpstreamError):
+                raise dados
+            return criar(dados)
+        except UpstreamError as e:
+            logger.info("Fonte indisponível para %s: %s", self.ticker, e)
+            self._erros.append(e)
+            if len(self._erros) == len(FONTES):
+                # Nenhuma fonte respondeu: erro transitório tem precedência sobre "não encontrado"
+                raise next((e for e in self._erros if not isinstance(e, TickerNotFoundError)), self._erros[0])
+            return criar(vazio)
 
 
     @property
@@ -53,8 +122,8 @@ class FII:
 
     @property
     def pvp(self):
-        if self.i10.get_pvp():
-            return self.i10.get_pvp()
+        if pvp := self.i10.get_pvp():
+            return pvp
         if self.fiiscom.pvp:
             return self.fiiscom.pvp
         return round(self.cotacao / self.vpa, 2) if self.vpa else None
@@ -63,8 +132,8 @@ class FII:
     def dividend_yield(self):
         if self.fiiscom.dividend_yield:
             return self.fiiscom.dividend_yield
-        if self.i10.get_dividend_yield():
-            return self.i10.get_dividend_yield()
+        if dividend_yield := self.i10.get_dividend_yield():
+            return dividend_yield
         return self.yf.dividend_yield
 
     @property
@@ -132,9 +201,22 @@ class FII:
     
     def segmento(self) -> str:
         """
-        Retorna o tipo do FII (Fundo de Papel, Fundo de Tijolo, etc).
+        Retorna o tipo do FII (Fundo de Papel, Fundo de Tijolo, etc). Sem o
+        Investidor10, classifica o segmento informado pelo fiis.com.br.
+        """
+        return self.i10.get_segmento() or Investidor10Service.classificar_segmento(self.fiiscom.segmento)
+
+    def _spread(self, db: IndicadoresAtivosDB) -> tuple[str, float]:
         """
-        return self.i10.get_segmento()
+        Tipo do FII e spread do tipo.
+
+        :raises UpstreamError: Nenhuma fonte informou o segmento
+        """
+        tipo = self.segmento()
+        spread = db.get_spread(tipo)
+        if spread is None:
+            raise UpstreamError(f"{self.ticker}: segmento indisponível nas fontes", "investidor10")
+        return tipo, spread
 
 
     @staticmethod
@@ -143,7 +225,10 @@ class FII:
         risco = db.get_risco(tipo)
         return risco if risco is not None else 10
 
-    def get_radar(self) -> dict:
+    def get_radar(self, indices: dict | None = None) -> dict:
+        """
+        :param indices: Índices já carregados (ver IndiceRefresher.get_indices_async); se ausentes são lidos aqui
+        """
         indices_service = IndiceRefresher()
         db = IndicadoresAtivosDB()
 
@@ -152,11 +237,11 @@ class FII:
             ticker += ".SA"
 
         ativo = self
-        tipo = ativo.i10.get_segmento()
-        spread = db.get_spread(tipo)
-        indice_base = indices_service.melhor_indice()
+        tipo, spread = ativo._spread(db)
+        if indices is None:
+            indices = indices_service.get_indices()
+        indice_base = indices_service.melhor_indice(indices)
         spread_total = spread + indice_base
-        indices = indices_service.get_indices()
 
         dy_estimado = (ativo.dividendo_estimado /12) / ativo.cotacao * 100
         teto_div = (ativo.dividendo_estimado /12) / spread_total * 100
@@ -199,8 +284,7 @@ class FII:
             ticker += ".SA"
 
         ativo = self
-        tipo = ativo.i10.get_segmento()
-        spread = db.get_spread(tipo)
+        tipo, spread = ativo._spread(db)
         indice_base = indices_service.melhor_indice()
         spread_total = spread + indice_base
         indices = indices_service.get_indices()
@@ -240,6 +324,192 @@ class FII:
             "investimento_necessario_para_1000_mensais": investimento_necessario
         }
 
+# fonte -> (serviço, normalização do ticker, busca na origem)
+FONTES = {
+    "yf": (FIIYahooService, lambda t: t, FIIYahooService.fetch_data),
+    "fiiscom": (FiisComService, lambda t: t.split(".")[0], FiisComService._fetch_fiiscom_data),
+    "i10": (Investidor10Service, lambda t: t.split(".")[0], Investidor10Service._buscar_campos),
+}
+
+
+def fontes_fii(ticker: str) -> dict:
+    """
+    Chave de cache e função de busca de cada fonte do FII.
+
+    :param ticker: Ticker do FII, ex: "HGLG11.SA"
+    :return: Dicionário fonte -> (chave, busca sem argumentos)
+    """
+    fontes = {}
+    for fonte, (servico, normaliza, buscar) in FONTES.items():
+        ticker_fonte = normaliza(ticker.upper())
+        fontes[fonte] = (servico.cache_key(ticker_fonte), partial(buscar, ticker_fonte))
+    return fontes
+
+
+def _dados_fiis(tickers: list[str], force: bool = False) -> dict[str, dict]:
+    """
+    Lê as três fontes de vários FIIs com uma única leitura em lote do cache,
+    buscando as ausentes em paralelo. Falhas da origem vêm como UpstreamError.
+
+    :return: Dicionário ticker (como recebido) -> {fonte: dados}
+    """
+    chaves = {}
+    buscas = {}
+    for ticker in tickers:
+        for fonte, (chave, buscar) in fontes_fii(ticker).items():
+            chaves[(ticker, fonte)] = chave
+            buscas[chave] = buscar
+
+    dados = get_cached_many(
+        list(buscas), lambda key: buscas[key](), force=force, soft_ttl=CACHE_SOFT_TTL, return_exceptions=True
+    )
+    return {ticker: {fonte: dados[chaves[(ticker, fonte)]] for fonte in FONTES} for ticker in tickers}
+
+
+def carregar_fiis(tickers: list[str], force: bool = False) -> dict[str, FII]:
+    """
+    Carrega vários FIIs lendo as três fontes de todos eles com uma única
+    leitura em lote do cache; apenas as entradas ausentes são buscadas.
+
+    :param tickers: Tickers dos FIIs, ex: ["HGLG11.SA", "MXRF11.SA"]
+    :param force: Se True, força atualização de todos
+    :return: Dicionário ticker (como recebido) -> FII
+    """
+    dados = _dados_fiis(tickers, force=force)
+    return {ticker: FII(ticker, dados=dados[ticker], prefetch=True) for ticker in tickers}
+
+# fonte -> busca assíncrona na origem (o yfinance é síncrono: roda em thread)
+BUSCAS_ASYNC = {
+    "yf": lambda t: asyncio.to_thread(FIIYahooService.fetch_data, t),
+    "fiiscom": FiisComService._fetch_fiiscom_data_async,
+    "i10": Investidor10Service._buscar_campos_async,
+}
+
+
+# fonte -> nome da fonte no circuit breaker e nos UpstreamError
+CIRCUITOS = {"yf": "yahoo", "fiiscom": "fiiscom", "i10": "investidor10"}
+
+# Hedge das buscas assíncronas: as três fontes já são buscadas em paralelo, então
+# uma fonte que passa do percentil FII_HEDGE_PERCENTIL da sua latência recente
+# (no mínimo FII_HEDGE_MIN segundos) deixa de ser aguardada assim que outra fonte
+# do FII respondeu; as propriedades recorrem às demais. A busca continua em
+# background e preenche o cache. FII_HEDGE_PERCENTIL=0 desativa.
+HEDGE_PERCENTIL = float(os.getenv("FII_HEDGE_PERCENTIL", 95))
+HEDGE_MIN = float(os.getenv("FII_HEDGE_MIN", 1))
+# Fontes sempre aguardadas: o Investidor10 informa o segmento, base do spread do radar
+SEM_HEDGE = {"i10"}
+
+# Buscas abandonadas pelo hedge, mantidas até terminarem
+_buscas_em_background: set[asyncio.Task] = set()
+
+
+def _prazo_hedge(fonte: str) -> float | None:
+    """Segundos aguardados pela fonte antes do hedge, ou None sem amostras suficientes."""
+    if HEDGE_PERCENTIL <= 0 or fonte in SEM_HEDGE:
+        return None
+    latencia = circuit_breaker.percentil_latencia(CIRCUITOS[fonte], HEDGE_PERCENTIL)
+    return max(latencia, HEDGE_MIN) if latencia is not None else None
+
+
+def _busca_em_background_terminada(tarefa: asyncio.Task):
+    _buscas_em_background.discard(tarefa)
+    if not tarefa.cancelled() and tarefa.exception() is not None:
+        logger.warning("Erro na busca em background: %s", tarefa.exception())
+
+
+async def _dados_fiis_async(tickers: list[str], force: bool = False) -> dict[str, dict]:
+    """
+    Versão assíncrona de _dados_fiis: as fontes de todos os FIIs são lidas e
+    buscadas concorrentemente no event loop atual, com hedge das fontes lentas
+    (ver HEDGE_PERCENTIL).
+
+    :return: Dicionário ticker (como recebido) -> {fonte: dados}
+    """
+    dados = {ticker: {} for ticker in tickers}
+    # Sinaliza que alguma fonte do FII já respondeu com dados
+    respondeu = {ticker: asyncio.Event() for ticker in tickers}
+
+    async def ler(fonte, ticker, chave):
+        _, normaliza, _ = FONTES[fonte]
+        ticker_fonte = normaliza(ticker.upper())
+        try:
+            return await get_cached_data_async(
+                chave, None, lambda: BUSCAS_ASYNC[fonte](ticker_fonte), force=force, soft_ttl=CACHE_SOFT_TTL
+            )
+        except UpstreamError as e:
+            return e
+
+    async def ler_com_hedge(fonte, ticker):
+        chave = fontes_fii(ticker)[fonte][0]
+        tarefa = asyncio.ensure_future(ler(fonte, ticker, chave))
+        prazo = _prazo_hedge(fonte)
+        if prazo is not None:
+            await asyncio.wait({tarefa}, timeout=prazo)
+            if not tarefa.done():
+                # Passou do prazo: aguarda a própria fonte ou a resposta de outra, o que vier antes
+                outra = asyncio.ensure_future(respondeu[ticker].wait())
+                await asyncio.wait({tarefa, outra}, return_when=asyncio.FIRST_COMPLETED)
+                outra.cancel()
+                if not tarefa.done():
+                    _buscas_em_background.add(tarefa)
+                    tarefa.add_done_callback(_busca_em_background_terminada)
+                    metrics.contar("cache_events_total", chave, event="hedge")
+                    logger.info("Hedge: %s sem resposta em %.1fs, seguindo com as demais fontes", chave, prazo)
+                    nome = CIRCUITOS[fonte]
+                    dados[ticker][fonte] = UpstreamError(f"{nome}: sem resposta em {prazo:.1f}s", nome)
+                    return
+        valor = await tarefa
+        dados[ticker][fonte] = valor
+        if not isinstance(valor, UpstreamError):
+            respondeu[ticker].set()
+
+    await asyncio.gather(*(ler_com_hedge(fonte, ticker) for ticker in tickers for fonte in FONTES))
+    # Mantém a ordem das fontes de FONTES
+    return {ticker: {fonte: dados[ticker][fonte] for fonte in FONTES} for ticker in tickers}
+
+
+async def carregar_fiis_async(tickers: list[str], force: bool = False) -> dict[str, FII]:
+    """
+    Versão assíncrona de carregar_fiis, para endpoints `async def`.
+
+    :param tickers: Tickers dos FIIs, ex: ["HGLG11.SA", "MXRF11.SA"]
+    :param force: Se True, força atualização de todos
+    :return: Dicionário ticker (como recebido) -> FII
+    """
+    dados = await _dados_fiis_async(tickers, force=force)
+    # Os serviços só montam Series/DataFrames a partir dos dados já carregados:
+    # o lote inteiro em uma única thread, para não ocupar o event loop
+    return await asyncio.to_thread(
+        lambda: {ticker: FII(ticker, dados=dados[ticker], prefetch=True) for ticker in tickers}
+    )
+
+def fii_valido(ticker: str) -> bool:
+    """
+    Verifica se o ticker corresponde a um FII com cotação, consultando uma fonte
+    por vez (fiis.com.br, depois Yahoo) em vez de carregar o FII completo.
+    Tickers inválidos ficam em cache negativo e são recusados sem nova busca.
+
+    :param ticker: Ticker do FII, ex: "HGLG11.SA"
+    """
+    ticker = ticker.upper()
+    fontes = (
+        lambda: FiisComService(ticker.split(".")[0]).cotacao,
+        lambda: FIIYahooService(ticker).cotacao,
+    )
+    erros = []
+    for cotacao in fontes:
+        try:
+            valor = cotacao()
+        except UpstreamError as e:
+            erros.append(e)
+            continue
+        if valor and valor > 0:
+            return True
+    transitorio = next((e for e in erros if not isinstance(e, TickerNotFoundError)), None)
+    if transitorio is not None and len(erros) == len(fontes):
+        raise transitorio
+    return False
+
 def convert_unix_date(unix_date: int) -> str:
     date_time = datetime.fromtimestamp(unix_date)
     return date_time.strftime('%d/%m')
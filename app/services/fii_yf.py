@@ -1,27 +1,59 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
+from app.utils import cache_schema, circuit_breaker
 from app.utils.redis_cache import get_cached_data
+from app.utils.upstream_errors import TickerNotFoundError, from_exception
+
+# Após esse tempo o cache é servido obsoleto e atualizado em background
+CACHE_SOFT_TTL = 12 * 60 * 60
+
+# Versão do formato de fetch_data no cache (ver cache_schema)
+CACHE_SCHEMA_VERSION = 1
+cache_schema.registrar("fii_yf", CACHE_SCHEMA_VERSION)
 
 class FIIYahooService:
-    def __init__(self, ticker: str, force: bool = False):
+    def __init__(self, ticker: str, force: bool = False, data: dict | None = None):
         self.ticker = ticker.upper()
-        def fetch_data():
-            fii_yf = yf.Ticker(self.ticker)
-            return {
-                "info": fii_yf.info,
-                "dividends": fii_yf.dividends.to_dict(),
-                "balance_sheet": fii_yf.balance_sheet.to_dict(),
-            }
-        data = get_cached_data(
-            key=f"fii_yf:{self.ticker}",
-            fetch_fn=fetch_data,
-            force=force
-        )
+        if data is None:
+            data = get_cached_data(
+                key=self.cache_key(self.ticker),
+                fetch_fn=lambda: self.fetch_data(self.ticker),
+                force=force,
+                soft_ttl=CACHE_SOFT_TTL,
+            )
         self._info = data["info"]
         self._dividends = pd.Series(data["dividends"])
         self._balance_sheet = pd.DataFrame(data["balance_sheet"])
 
+    @staticmethod
+    def cache_key(ticker: str) -> str:
+        return f"fii_yf:{ticker.upper()}"
+
+    @staticmethod
+    @circuit_breaker.protegido("yahoo")
+    def fetch_data(ticker: str) -> dict:
+        fii_yf = yf.Ticker(ticker.upper())
+        try:
+            data = {
+                "info": fii_yf.info,
+                "dividends": fii_yf.dividends.to_dict(),
+                "balance_sheet": fii_yf.balance_sheet,
+            }
+        except Exception as e:
+            erro = from_exception(e, "yahoo")
+            if erro is None:
+                raise
+            raise erro from e
+        if not data["dividends"] and data["balance_sheet"].empty and not any(
+            k in data["info"] for k in ("currentPrice", "ask", "previousClose")
+        ):
+            raise TickerNotFoundError(f"yahoo: {ticker} não encontrado", "yahoo")
+        return data
+
+    # Dados vazios, usados quando a fonte falha (ver FII)
+    DADOS_VAZIOS = {"info": {}, "dividends": {}, "balance_sheet": {}}
+
     @property
     def info(self):
         return self._info
@@ -1,27 +1,98 @@
+import asyncio
+
 import requests
-from bs4 import BeautifulSoup
 import json
 from datetime import datetime
 import pandas as pd
+from app.utils import cache_schema, circuit_breaker, html_parser, http_client
+from app.utils.revalidacao import Condicional
 from app.utils.redis_cache import get_cached_data
+from app.utils.upstream_errors import TickerNotFoundError, UpstreamError, raise_for_status
+
+# Após esse tempo o cache é servido obsoleto e atualizado em background
+CACHE_SOFT_TTL = 12 * 60 * 60
+
+# Versão do formato de _fetch_fiiscom_data no cache
+CACHE_SCHEMA_VERSION = 1
+cache_schema.registrar("fiiscom", CACHE_SCHEMA_VERSION)
+
+# Elementos da página lidos por _parse_fiiscom (mantidos com toda a subárvore);
+# o restante do documento não é montado
+_CLASSES_FIISCOM = frozenset({
+    "headerTicker__content__name", "indicators", "quotation", "min-max", "valorization",
+    "yieldChart__table__bloco--rendimento", "moreInfo",
+})
+
+
+def _alvo_fiiscom(nome: str, attrs: dict) -> bool:
+    return (
+        nome == "h1"
+        or (nome == "script" and attrs.get("type") == "application/ld+json")
+        or not _CLASSES_FIISCOM.isdisjoint(html_parser.classes(attrs))
+    )
 
 class FiisComService:
-    def __init__(self, ticker: str, force: bool = False):
+    def __init__(self, ticker: str, force: bool = False, dados: dict | None = None):
         self.ticker = ticker.upper()
-        self._dados = get_cached_data(
-            key=f"fiiscom:{self.ticker}",
-            fetch_fn=self._fetch_fiiscom_data,
-            force=force
-        )
-
-    def _fetch_fiiscom_data(self):
-        url = f"https://fiis.com.br/{self.ticker.lower()}/"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:127.0) Gecko/20100101 Firefox/127.0"
-        }
-        resp = requests.get(url, headers=headers)
+        if dados is None:
+            dados = get_cached_data(
+                key=self.cache_key(self.ticker),
+                fetch_fn=lambda: self._fetch_fiiscom_data(self.ticker),
+                force=force,
+                soft_ttl=CACHE_SOFT_TTL,
+            )
+        self._dados = dados
+
+    @staticmethod
+    def cache_key(ticker: str) -> str:
+        return f"fiiscom:{ticker.upper()}"
+
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:127.0) Gecko/20100101 Firefox/127.0"
+    }
+
+    @staticmethod
+    def url(ticker: str) -> str:
+        return f"https://fiis.com.br/{ticker.lower()}/"
+
+    @classmethod
+    @circuit_breaker.protegido("fiiscom")
+    def _fetch_fiiscom_data(cls, ticker: str):
+        # Requisição condicional: página inalterada reaproveita os dados em cache
+        cond = Condicional(cls.cache_key(ticker))
+        try:
+            resp = http_client.get(cls.url(ticker), headers={**cls.HEADERS, **cond.headers})
+        except requests.RequestException as e:
+            raise UpstreamError(f"fiiscom: {e}", "fiiscom") from e
+        raise_for_status(resp, "fiiscom")
         resp.encoding = "utf-8"
-        soup = BeautifulSoup(resp.text, "html.parser")
+        if cond.inalterado(resp):
+            return cond.valor
+        dados = cls._parse_fiiscom(resp.text, ticker)
+        cond.salvar(resp)
+        return dados
+
+    @classmethod
+    @circuit_breaker.protegido("fiiscom")
+    async def _fetch_fiiscom_data_async(cls, ticker: str):
+        cond = await asyncio.to_thread(Condicional, cls.cache_key(ticker))
+        try:
+            resp = await http_client.aget(
+                cls.url(ticker), headers={**cls.HEADERS, **cond.headers}, encoding="utf-8"
+            )
+        except http_client.ERROS_REDE_ASYNC as e:
+            raise UpstreamError(f"fiiscom: {e}", "fiiscom") from e
+        raise_for_status(resp, "fiiscom")
+        if await asyncio.to_thread(cond.inalterado, resp):
+            return cond.valor
+        # O parse é CPU-bound: roda fora do event loop
+        dados = await asyncio.to_thread(cls._parse_fiiscom, resp.text, ticker)
+        await asyncio.to_thread(cond.salvar, resp)
+        return dados
+
+    @staticmethod
+    def _parse_fiiscom(html: str, ticker: str) -> dict:
+        soup = html_parser.parse(html, _alvo_fiiscom)
 
         h1 = soup.find("h1")
         nome = h1.get_text(strip=True) if h1 else ""
@@ -31,22 +102,34 @@ class FiisComService:
             descricao = desc_div.find("p").get_text(strip=True)
 
         indicadores = []
+        indicadores_extras = {}
         dividend_yield_html = None
         indicators = soup.find("div", class_="indicators")
-        if indicators:
-            for box in indicators.find_all("div", class_="indicators__box"):
+        if desc_div is None and indicators is None:
+            # Ticker inexistente: o site responde com a página de erro/busca
+            raise TickerNotFoundError(f"fiiscom: {ticker} não encontrado", "fiiscom")
+        # Uma passada pelos boxes: os do primeiro bloco de indicadores formam a
+        # lista; os dos blocos .wrapper.indicators, o dicionário de extras
+        blocos = [indicators] if indicators else []
+        blocos += [bloco for bloco in soup.select(".wrapper.indicators") if bloco is not indicators]
+        for bloco in blocos:
+            extras = "wrapper" in bloco.get("class", [])
+            for box in bloco.find_all("div", class_="indicators__box"):
                 ps = box.find_all("p")
-                valor = ""
-                label = ""
-                if len(ps) == 2:
-                    valor = ps[0].find("b").get_text(strip=True) if ps[0].find("b") else ""
-                    label = ps[1].get_text(strip=True)
-                elif len(ps) == 1:
-                    valor = ps[0].find("b").get_text(strip=True) if ps[0].find("b") else ""
+                if bloco is indicators:
+                    valor = ""
                     label = ""
-                indicadores.append((label, valor))
-                if "Dividend Yield" in label and valor:
-                    dividend_yield_html = float(valor.replace(",", ".").replace("%", "").strip())
+                    if len(ps) in (1, 2):
+                        b = ps[0].find("b")
+                        valor = b.get_text(strip=True) if b else ""
+                    if len(ps) == 2:
+                        label = ps[1].get_text(strip=True)
+                    indicadores.append((label, valor))
+                    if "Dividend Yield" in label and valor:
+                        dividend_yield_html = float(valor.replace(",", ".").replace("%", "").strip())
+                if extras and len(ps) > 1:
+                    b = box.find("b")
+                    indicadores_extras[ps[1].get_text(strip=True)] = b.get_text(strip=True) if b else ""
 
         cotacao = ""
         min_52 = ""
@@ -96,14 +179,6 @@ class FiisComService:
             except Exception:
                 pass
 
-        indicadores_extras = {}
-        for box in soup.select(".wrapper.indicators .indicators__box"):
-            label = box.find_all("p")
-            if len(label) > 1:
-                key = label[1].get_text(strip=True)
-                val = box.find("b").get_text(strip=True) if box.find("b") else ""
-                indicadores_extras[key] = val
-
         return {
             "nome": nome,
             "descricao": descricao,
@@ -119,6 +194,22 @@ class FiisComService:
             "dividend_yield_html": dividend_yield_html,
         }
 
+    # Estrutura sem dados, usada quando a fonte falha (ver FII)
+    DADOS_VAZIOS = {
+        "nome": "",
+        "descricao": "",
+        "indicadores": [],
+        "cotacao_atual": "",
+        "min_52_semanas": "",
+        "max_52_semanas": "",
+        "valorizacao_12_meses": "",
+        "dividendos": [],
+        "info_extra": {},
+        "jsonld": {},
+        "indicadores_extras": {},
+        "dividend_yield_html": None,
+    }
+
     @property
     def dados(self):
         return self._dados
@@ -1,8 +1,17 @@
+import asyncio
 from datetime import datetime, timedelta
 from app.services.banco_central import SELIC, IPCA
-from app.utils.redis_cache import get_cached_data
+from app.utils import cache_schema
+from app.utils.redis_cache import get_cached_data, get_cached_data_async
 import json
 
+# Após esse tempo os índices são servidos obsoletos e atualizados em background
+CACHE_SOFT_TTL = 24 * 60 * 60
+
+# Versão do dicionário de índices em cache
+CACHE_SCHEMA_VERSION = 1
+cache_schema.registrar("indices_bcb", CACHE_SCHEMA_VERSION)
+
 class IndiceRefresher:
     """
     Serviço para gerenciar índices: busca no Redis ou atualiza via Banco Central.
@@ -19,31 +28,52 @@ class IndiceRefresher:
         :return: Dicionário com índices (selic, ipca, etc)
         """
         def fetch_indices():
-            selic = SELIC(5)
-            ipca = IPCA(5)
-            ipca_atual = IPCA(1)
-            novo_indices = {
-                "selic": selic.media_ganho_real(),
-                "selic_atual": selic.atual(),
-                "ipca": ipca.media_ganho_real(),
-                "ipca_media5": ipca.media_anual(),
-                "ipca_atual": ipca_atual.media_anual(),
-                "data_atualizacao": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            }
-            return novo_indices
+            return self._calcular(SELIC(5), IPCA(5), IPCA(1))
 
         from app.utils.redis_cache import get_cached_data
 
-        indices_dict = get_cached_data(self.cache_key, None, fetch_indices, force=force_update)
+        indices_dict = get_cached_data(self.cache_key, None, fetch_indices, force=force_update, soft_ttl=CACHE_SOFT_TTL)
         return {k: v for k, v in indices_dict.items() if k != "data_atualizacao"}
 
-    def melhor_indice(self) -> float:
+    async def get_indices_async(self, force_update: bool = False) -> dict:
+        """
+        Versão assíncrona de get_indices; as séries são baixadas em paralelo.
+
+        :param force_update: Se True, força atualização dos dados do Banco Central
+        :return: Dicionário com índices (selic, ipca, etc)
+        """
+        async def fetch_indices():
+            selic, ipca, ipca_atual = SELIC(5), IPCA(5), IPCA(1)
+            await asyncio.gather(selic.carregar_async(), ipca.carregar_async())
+            # Mesma série do IPCA de 5 anos, já sincronizada: lida do SQLite
+            await ipca_atual.carregar_async()
+            return self._calcular(selic, ipca, ipca_atual)
+
+        indices_dict = await get_cached_data_async(
+            self.cache_key, None, fetch_indices, force=force_update, soft_ttl=CACHE_SOFT_TTL
+        )
+        return {k: v for k, v in indices_dict.items() if k != "data_atualizacao"}
+
+    @staticmethod
+    def _calcular(selic: SELIC, ipca: IPCA, ipca_atual: IPCA) -> dict:
+        return {
+            "selic": selic.media_ganho_real(),
+            "selic_atual": selic.atual(),
+            "ipca": ipca.media_ganho_real(),
+            "ipca_media5": ipca.media_anual(),
+            "ipca_atual": ipca_atual.media_anual(),
+            "data_atualizacao": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def melhor_indice(self, indices: dict | None = None) -> float:
         """
         Retorna o melhor índice entre SELIC e IPCA armazenados.
 
+        :param indices: Índices já carregados (ver get_indices); se ausentes são lidos do cache
         :return: Valor do melhor índice
         """
-        indices = self.get_indices()
+        if indices is None:
+            indices = self.get_indices()
         return max(indices.get("selic", 0), indices.get("ipca", 0))
 
 if __name__ == "__main__":
@@ -1,6 +1,32 @@
+import asyncio
+
 import requests
-from bs4 import BeautifulSoup
+from app.utils import cache_schema, circuit_breaker, html_parser, http_client
+from app.utils.revalidacao import Condicional
 from app.utils.redis_cache import get_cached_data
+from app.utils.upstream_errors import UpstreamError, raise_for_status
+
+# Após esse tempo o cache é servido obsoleto e atualizado em background
+CACHE_SOFT_TTL = 12 * 60 * 60
+
+# Versão do conteúdo gravado por _buscar_campos. A versão 1 guardava o HTML
+# bruto da página; a 2 guarda só os campos extraídos (ver _extrair)
+CACHE_SCHEMA_VERSION = 2
+cache_schema.registrar("investidor10", CACHE_SCHEMA_VERSION, {
+    1: lambda html: Investidor10Service._extrair(html),
+})
+
+
+def _numero(texto: str | None, *remover: str) -> float | None:
+    """Converte o texto de um indicador ("R$ 10,50", "12,3%") em float; None se ausente ou inválido."""
+    if texto is None:
+        return None
+    for trecho in remover:
+        texto = texto.replace(trecho, "")
+    try:
+        return float(texto.replace(",", "."))
+    except ValueError:
+        return None
 
 
 class Investidor10Service:
@@ -14,31 +40,77 @@ class Investidor10Service:
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
     }
 
-    def __init__(self, ticker: str, force: bool = False):
+    # Campos de uma página sem dados, usados quando a fonte falha (ver FII)
+    DADOS_VAZIOS = {
+        "cotacao": None,
+        "dividend_yield": None,
+        "pvp": None,
+        "segmento": None,
+        "indicadores": {},
+    }
+
+    def __init__(self, ticker: str, force: bool = False, campos: dict | None = None):
         """
         Inicializa o serviço com o ticker desejado.
 
         :param ticker: Ticker do FII, ex: "HGLG11"
         :param force: Se True, força atualização do cache
+        :param campos: Campos já carregados do cache (ver _extrair); evita nova leitura
         """
         self.ticker = ticker.upper()
-        html = get_cached_data(
-            key=f"investidor10:{self.ticker}",
-            fetch_fn=lambda: self._baixar_html_raw(),
-            force=force
-        )
-        self.soup = BeautifulSoup(html, 'html.parser')
-
-    def _baixar_html_raw(self) -> str:
+        if campos is None:
+            campos = get_cached_data(
+                key=self.cache_key(self.ticker),
+                fetch_fn=lambda: self._buscar_campos(self.ticker),
+                force=force,
+                soft_ttl=CACHE_SOFT_TTL,
+            )
+        self.campos = campos
+
+    @staticmethod
+    def cache_key(ticker: str) -> str:
+        return f"investidor10:{ticker.upper()}"
+
+    @classmethod
+    @circuit_breaker.protegido("investidor10")
+    def _buscar_campos(cls, ticker: str) -> dict:
         """
-        Realiza o download da página do FII no Investidor10 e retorna o HTML bruto.
+        Realiza o download da página do FII no Investidor10 e extrai os campos usados.
 
-        :return: HTML da página como string
+        :param ticker: Ticker do FII, ex: "HGLG11"
+        :return: Campos da página (ver _extrair)
         """
-        url = f"{self.BASE_URL}{self.ticker}"
-        response = requests.get(url, headers=self.HEADERS)
-        response.raise_for_status()
-        return response.text
+        url = f"{cls.BASE_URL}{ticker.upper()}"
+        # Requisição condicional: página inalterada reaproveita os campos em cache
+        cond = Condicional(cls.cache_key(ticker))
+        try:
+            response = http_client.get(url, headers={**cls.HEADERS, **cond.headers})
+        except requests.RequestException as e:
+            raise UpstreamError(f"investidor10: {e}", "investidor10") from e
+        raise_for_status(response, "investidor10")
+        if cond.inalterado(response):
+            return cond.valor
+        campos = cls._extrair(response.text)
+        cond.salvar(response)
+        return campos
+
+    @classmethod
+    @circuit_breaker.protegido("investidor10")
+    async def _buscar_campos_async(cls, ticker: str) -> dict:
+        """Versão assíncrona de _buscar_campos."""
+        url = f"{cls.BASE_URL}{ticker.upper()}"
+        cond = await asyncio.to_thread(Condicional, cls.cache_key(ticker))
+        try:
+            response = await http_client.aget(url, headers={**cls.HEADERS, **cond.headers})
+        except http_client.ERROS_REDE_ASYNC as e:
+            raise UpstreamError(f"investidor10: {e}", "investidor10") from e
+        raise_for_status(response, "investidor10")
+        if await asyncio.to_thread(cond.inalterado, response):
+            return cond.valor
+        # O parse é CPU-bound: roda fora do event loop
+        campos = await asyncio.to_thread(cls._extrair, response.text)
+        await asyncio.to_thread(cond.salvar, response)
+        return campos
 
     # def _baixar_html(self) -> BeautifulSoup:
     #     """
@@ -51,17 +123,61 @@ class Investidor10Service:
     #     response.raise_for_status()
     #     return BeautifulSoup(response.content, 'html.parser', from_encoding='utf-8')
 
+    @staticmethod
+    def _alvo(nome: str, attrs: dict) -> bool:
+        # Cotação, DY e P/VP são spans (o valor é o span seguinte ao título); os
+        # demais indicadores ficam na tabela. O resto da página não é montado
+        return nome == "span" or attrs.get("id") == "table-indicators"
+
+    @classmethod
+    def _extrair(cls, html: str) -> dict:
+        """
+        Extrai, em uma única passada, os campos gravados no cache: cotação,
+        Dividend Yield, P/VP, segmento e a tabela de indicadores (rótulo -> valor).
+
+        :param html: HTML da página do FII
+        :return: Dicionário de campos; ausentes ficam como None
+        """
+        soup = html_parser.parse(html, cls._alvo)
+
+        def texto_seguinte(titulo):
+            tag = soup.find('span', title=titulo)
+            valor = tag.find_next('span') if tag else None
+            return valor.text.strip() if valor else None
+
+        cotacao_span = soup.find('span', class_='value')
+        indicadores = {}
+        table = soup.find('div', id='table-indicators')
+        if table:
+            for cell in table.find_all('div', class_='cell'):
+                label_span = cell.find('span', class_='d-flex justify-content-between align-items-center name')
+                value_div = cell.find('div', class_='value')
+                value_span = value_div.find('span') if value_div else None
+                if label_span and value_span:
+                    indicadores.setdefault(label_span.get_text(strip=True).upper(), value_span.get_text(strip=True))
+
+        return {
+            "cotacao": _numero(cotacao_span.text.strip() if cotacao_span else None, "R$ "),
+            "dividend_yield": _numero(texto_seguinte('Dividend Yield'), "%"),
+            "pvp": _numero(texto_seguinte('P/VP')),
+            "segmento": cls._buscar_na_tabela(indicadores, "SEGMENTO"),
+            "indicadores": indicadores,
+        }
+
+    @staticmethod
+    def _buscar_na_tabela(indicadores: dict, field_name: str) -> str | None:
+        for label, valor in indicadores.items():
+            if field_name.upper() in label:
+                return valor
+        return None
+
     def get_cotacao(self) -> float | None:
         """
         Retorna a cotação atual do FII.
 
         :return: Cotação em float ou None se não encontrado
         """
-        cotacao_span = self.soup.find('span', class_='value')
-        if cotacao_span:
-            cotacao = cotacao_span.text.strip().replace("R$ ", "").replace(",", ".")
-            return float(cotacao)
-        return None
+        return self.campos["cotacao"]
 
     def get_dividend_yield(self) -> float | None:
         """
@@ -69,11 +185,7 @@ class Investidor10Service:
 
         :return: Dividend Yield em percentual ou None se não encontrado
         """
-        tag = self.soup.find('span', title='Dividend Yield')
-        if tag:
-            value = tag.find_next('span').text.strip()
-            return float(value.replace("%", "").replace(",", "."))
-        return None
+        return self.campos["dividend_yield"]
 
     def get_pvp(self) -> float | None:
         """
@@ -81,11 +193,7 @@ class Investidor10Service:
 
         :return: P/VP como float ou None se não encontrado
         """
-        tag = self.soup.find('span', title='P/VP')
-        if tag:
-            value = tag.find_next('span').text.strip()
-            return float(value.replace(",", "."))
-        return None
+        return self.campos["pvp"]
     
 
     def get_info_from_table(self, field_name: str) -> str | None:
@@ -95,25 +203,15 @@ class Investidor10Service:
         :param field_name: Nome do campo a buscar (ex: 'SEGMENTO')
         :return: Valor do campo ou None se não encontrado
         """
-        table = self.soup.find('div', id='table-indicators')
-        if not table:
-            return None
-
-        for cell in table.find_all('div', class_='cell'):
-            label_span = cell.find('span', class_='d-flex justify-content-between align-items-center name')
-            if label_span:
-                label = label_span.get_text(strip=True).upper()
-                if field_name.upper() in label:
-                    value_div = cell.find('div', class_='value')
-                    if value_div:
-                        value_span = value_div.find('span')
-                        if value_span:
-                            return value_span.get_text(strip=True)
-        return None
+        return self._buscar_na_tabela(self.campos["indicadores"], field_name)
 
     def get_segmento(self) -> str | None:
-        segmento = self.get_info_from_table("SEGMENTO")
-        if segmento is None:
+        return self.classificar_segmento(self.campos["segmento"])
+
+    @staticmethod
+    def classificar_segmento(segmento: str | None) -> str | None:
+        """Tipo do FII (ex: "logistica", "papel") a partir do segmento descrito na fonte."""
+        if not segmento:
             return None
         
         if "fiagro" in segmento.lower():
@@ -0,0 +1,99 @@
+import argparse
+import os
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from app.services.fiiscom import FiisComService
+from app.services.investidor10 import Investidor10Service
+from app.utils import html_parser, http_client
+
+# Benchmark do parse das páginas salvas do fiis.com.br e do Investidor10,
+# comparando a árvore completa com html.parser (abordagem anterior) com a
+# extração atual (só os elementos usados, com HTML_PARSER).
+#
+#   python -m app.services.parse_benchmark --dir paginas --baixar HGLG11 MXRF11
+#   python -m app.services.parse_benchmark --dir paginas -n 50
+
+FONTES = {
+    "fiiscom": (
+        lambda ticker: http_client.get(FiisComService.url(ticker), headers=FiisComService.HEADERS),
+        lambda html: FiisComService._parse_fiiscom(html, "benchmark"),
+    ),
+    "investidor10": (
+        lambda ticker: http_client.get(f"{Investidor10Service.BASE_URL}{ticker.upper()}",
+                                       headers=Investidor10Service.HEADERS),
+        Investidor10Service._extrair,
+    ),
+}
+
+
+def baixar_paginas(diretorio: str, tickers: list[str]):
+    """Salva as páginas dos tickers em `diretorio` como {fonte}_{TICKER}.html."""
+    os.makedirs(diretorio, exist_ok=True)
+    for ticker in tickers:
+        for fonte, (baixar, _) in FONTES.items():
+            resp = baixar(ticker)
+            resp.raise_for_status()
+            resp.encoding = "utf-8"
+            with open(os.path.join(diretorio, f"{fonte}_{ticker.upper()}.html"), "w", encoding="utf-8") as f:
+                f.write(resp.text)
+
+
+def _medir(fn, html: str, repeticoes: int) -> float:
+    """Mediana do tempo (ms) de `repeticoes` execuções."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn(html)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def executar(diretorio: str, repeticoes: int = 20) -> list[dict]:
+    """
+    Mede o parse de cada página salva em `diretorio`.
+
+    :return: Lista de {pagina, kb, completo_ms, extracao_ms}
+    """
+    resultados = []
+    for nome in sorted(os.listdir(diretorio)):
+        fonte = nome.split("_", 1)[0]
+        if fonte not in FONTES or not nome.endswith(".html"):
+            continue
+        with open(os.path.join(diretorio, nome), encoding="utf-8") as f:
+            html = f.read()
+        _, extrair = FONTES[fonte]
+        resultados.append({
+            "pagina": nome,
+            "kb": round(len(html.encode("utf-8")) / 1024, 1),
+            "completo_ms": round(_medir(lambda h: BeautifulSoup(h, "html.parser"), html, repeticoes), 2),
+            "extracao_ms": round(_medir(extrair, html, repeticoes), 2),
+        })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do parse das páginas de FIIs")
+    parser.add_argument("--dir", default="paginas", help="Diretório das páginas salvas")
+    parser.add_argument("--baixar", nargs="*", default=[], metavar="TICKER", help="Baixa as páginas antes de medir")
+    parser.add_argument("-n", type=int, default=20, help="Repetições por página")
+    args = parser.parse_args()
+
+    if args.baixar:
+        baixar_paginas(args.dir, args.baixar)
+    resultados = executar(args.dir, args.n)
+    if not resultados:
+        print(f"Nenhuma página em {args.dir} (use --baixar)")
+        return
+
+    print(f"Parser: {html_parser.PARSER}")
+    print(f"{'página':<32} {'KB':>8} {'árvore completa':>16} {'extração':>10} {'ganho':>7}")
+    for r in resultados:
+        ganho = r["completo_ms"] / r["extracao_ms"] if r["extracao_ms"] else 0
+        print(f"{r['pagina']:<32} {r['kb']:>8} {r['completo_ms']:>13} ms {r['extracao_ms']:>7} ms {ganho:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
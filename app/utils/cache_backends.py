@@ -0,0 +1,595 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Backend de armazenamento do cache: redis (padrão), memory, sqlite ou tiered
+# (SQLite local na frente do Redis). Os valores chegam já codificados (bytes).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis")
+SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sqlite", "cache.db")),
+)
+# Tempo máximo (s) que uma entrada fica na camada local do backend tiered
+LOCAL_TIER_TTL = int(os.getenv("CACHE_LOCAL_TIER_TTL", 300))
+SQLITE_POLL = 0.05
+# Eventos de pub/sub do SQLite mais antigos que isso (s) são descartados
+SQLITE_EVENTS_RETENTION = 60
+
+
+class Subscription:
+    """Inscrição em um canal de pub/sub. Mensagens são devolvidas como str."""
+
+    def get_message(self, timeout: float) -> str | None:
+        raise NotImplementedError
+
+    def listen(self):
+        while True:
+            message = self.get_message(timeout=1.0)
+            if message is not None:
+                yield message
+
+    def close(self):
+        pass
+
+
+class CacheBackend:
+    """
+    Interface dos backends do cache. Além de chave/valor com TTL, oferece os
+    locks e o pub/sub usados pelo single-flight e pela invalidação do L1, e o
+    token bucket usado pelo limite de requisições às fontes.
+    """
+
+    nome = "base"
+    # Visível por outros processos: só então o listener de invalidação é útil
+    compartilhado = True
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [self.get(key) for key in keys]
+
+    def mget_ttl(self, keys: list[str]) -> list[tuple[bytes | None, float | None]]:
+        """Como mget, com os segundos de vida restantes de cada valor (None: sem expiração)."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: int | None = None, nx: bool = False) -> bool:
+        """Grava o valor; com nx=True só grava se a chave não existir. Retorna se gravou."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def acquire_lock(self, key: str, token: str, ttl: int) -> bool:
+        return self.set(key, token.encode(), ttl, nx=True)
+
+    def release_lock(self, key: str, token: str):
+        """Remove o lock apenas se ele ainda pertence a `token`."""
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: str):
+        raise NotImplementedError
+
+    def subscribe(self, channel: str) -> Subscription:
+        raise NotImplementedError
+
+    def invalidate_local(self, key: str):
+        """Descarta cópias locais da chave (regravada por outro worker)."""
+
+    def reserve_token(self, key: str, rate: float, burst: int) -> float:
+        """
+        Reserva uma ficha do token bucket `key` (rate fichas/s, até burst
+        acumuladas). O saldo pode ficar negativo: as reservas formam uma fila.
+
+        :return: Segundos a aguardar até a ficha reservada (0 = imediatamente)
+        """
+        raise NotImplementedError
+
+    def incr_metrics(self, valores: dict[str, float]):
+        raise NotImplementedError
+
+    def read_metrics(self) -> dict[str, float]:
+        raise NotImplementedError
+
+
+class _RedisSubscription(Subscription):
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get_message(self, timeout: float) -> str | None:
+        message = self._pubsub.get_message(timeout=timeout)
+        return message["data"].decode() if message else None
+
+    def listen(self):
+        for message in self._pubsub.listen():
+            yield message["data"].decode()
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisBackend(CacheBackend):
+    """Cache compartilhado por todos os workers e instâncias da API."""
+
+    nome = "redis"
+    METRICS_KEY = "cache:metrics"
+
+    def __init__(self, host: str = None, port: int = None, db: int = None):
+        import redis
+
+        # A conexão só é aberta no primeiro comando
+        self.client = redis.StrictRedis(
+            host=host or os.getenv("REDIS_HOST", "localhost"),
+            port=port or int(os.getenv("REDIS_PORT", 6379)),
+            db=db if db is not None else int(os.getenv("REDIS_DB", 0)),
+            decode_responses=False,
+        )
+        self._release = self.client.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+        # Usa o relógio do Redis, comum a todos os hosts
+        self._reserve = self.client.register_script("""
+local t = redis.call('time')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local estado = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(estado[1]) or burst
+local ts = tonumber(estado[2]) or agora
+tokens = math.min(burst, tokens + (agora - ts) * rate) - 1
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(agora))
+local espera = 0
+if tokens < 0 then espera = -tokens / rate end
+redis.call('expire', KEYS[1], math.ceil(burst / rate + espera) + 1)
+return tostring(espera)
+""")
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def mget(self, keys):
+        return self.client.mget(keys)
+
+    def mget_ttl(self, keys):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.mget(keys)
+        for key in keys:
+            pipe.pttl(key)
+        valores, *pttls = pipe.execute()
+        # PTTL: -1 sem expiração, -2 chave ausente (o valor já veio None)
+        return [(value, None if pttl < 0 else pttl / 1000) for value, pttl in zip(valores, pttls)]
+
+    def set(self, key, value, ttl=None, nx=False):
+        return bool(self.client.set(key, value, ex=ttl, nx=nx))
+
+    def exists(self, key):
+        return bool(self.client.exists(key))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def release_lock(self, key, token):
+        self._release(keys=[key], args=[token])
+
+    def publish(self, channel, message):
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        return _RedisSubscription(pubsub)
+
+    def reserve_token(self, key, rate, burst):
+        return float(self._reserve(keys=[key], args=[rate, burst]))
+
+    def incr_metrics(self, valores):
+        pipe = self.client.pipeline(transaction=False)
+        for campo, valor in valores.items():
+            pipe.hincrbyfloat(self.METRICS_KEY, campo, valor)
+        pipe.execute()
+
+    def read_metrics(self):
+        return {campo.decode(): float(valor) for campo, valor in self.client.hgetall(self.METRICS_KEY).items()}
+
+
+class _MemorySubscription(Subscription):
+    def __init__(self, backend: "MemoryBackend", channel: str):
+        self._backend = backend
+        self._channel = channel
+        self._queue = queue.Queue()
+
+    def get_message(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._backend._unsubscribe(self._channel, self._queue)
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Cache no próprio processo, sem dependências externas. Indicado para testes,
+    benchmarks e execução com um único worker.
+    """
+
+    nome = "memory"
+    compartilhado = False
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, bytes]] = {}
+        self._subs: dict[str, list[queue.Queue]] = defaultdict(list)
+        self._metrics: dict[str, float] = defaultdict(float)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _valido(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._valido(key)
+
+    def mget_ttl(self, keys):
+        agora = time.time()
+        with self._lock:
+            valores = [self._valido(key) for key in keys]
+            return [
+                (value, None if value is None or self._data[key][0] is None else self._data[key][0] - agora)
+                for key, value in zip(keys, valores)
+            ]
+
+    def set(self, key, value, ttl=None, nx=False):
+        with self._lock:
+            if nx and self._valido(key) is not None:
+                return False
+            self._data[key] = (time.time() + ttl if ttl is not None else None, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def release_lock(self, key, token):
+        with self._lock:
+            if self._valido(key) == token.encode():
+                del self._data[key]
+
+    def publish(self, channel, message):
+        with self._lock:
+            for q in self._subs.get(channel, ()):
+                q.put(message)
+
+    def subscribe(self, channel):
+        sub = _MemorySubscription(self, channel)
+        with self._lock:
+            self._subs[channel].append(sub._queue)
+        return sub
+
+    def _unsubscribe(self, channel, q):
+        with self._lock:
+            filas = self._subs.get(channel, [])
+            if q in filas:
+                filas.remove(q)
+            if not filas:
+                self._subs.pop(channel, None)
+
+    def reserve_token(self, key, rate, burst):
+        with self._lock:
+            agora = time.monotonic()
+            tokens, ts = self._buckets.get(key, (burst, agora))
+            tokens = min(burst, tokens + (agora - ts) * rate) - 1
+            self._buckets[key] = (tokens, agora)
+        return max(0.0, -tokens / rate)
+
+    def incr_metrics(self, valores):
+        with self._lock:
+            for campo, valor in valores.items():
+                self._metrics[campo] += valor
+
+    def read_metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+
+class _SQLiteSubscription(Subscription):
+    def __init__(self, backend: "SQLiteBackend", channel: str):
+        self._backend = backend
+        self._channel = channel
+        # Só recebe eventos publicados depois da inscrição
+        self._ultimo = backend._conn().execute("SELECT COALESCE(MAX(id), 0) FROM cache_events").fetchone()[0]
+
+    def get_message(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self._backend._conn().execute(
+                "SELECT id, message FROM cache_events WHERE id > ? AND channel = ? ORDER BY id LIMIT 1",
+                (self._ultimo, self._channel),
+            ).fetchone()
+            if row is not None:
+                self._ultimo = row[0]
+                return row[1]
+            restante = deadline - time.monotonic()
+            if restante <= 0:
+                return None
+            time.sleep(min(SQLITE_POLL, restante))
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Cache em arquivo SQLite (modo WAL), compartilhado pelos workers do mesmo
+    host. O pub/sub é emulado com uma tabela de eventos consultada por polling.
+    """
+
+    nome = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._iniciado = False
+        self._escritas = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._init_lock:
+            if not self._iniciado:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        key TEXT PRIMARY KEY,
+                        value BLOB NOT NULL,
+                        expires_at REAL
+                    );
+                    CREATE TABLE IF NOT EXISTS cache_events (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        channel TEXT NOT NULL,
+                        message TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS cache_metrics (
+                        field TEXT PRIMARY KEY,
+                        value REAL NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS cache_buckets (
+                        key TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        ts REAL NOT NULL
+                    );
+                """)
+                self._iniciado = True
+        self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def mget(self, keys):
+        return [value for value, _ in self.mget_ttl(keys)]
+
+    def mget_ttl(self, keys):
+        encontrados = {}
+        agora = time.time()
+        # Limite de parâmetros por consulta do SQLite
+        for i in range(0, len(keys), 500):
+            lote = keys[i:i + 500]
+            rows = self._conn().execute(
+                f"SELECT key, value, expires_at FROM cache WHERE key IN ({','.join('?' * len(lote))}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (*lote, agora),
+            ).fetchall()
+            encontrados.update((key, (value, None if expires_at is None else expires_at - agora))
+                               for key, value, expires_at in rows)
+        return [encontrados.get(key, (None, None)) for key in keys]
+
+    def set(self, key, value, ttl=None, nx=False):
+        agora = time.time()
+        expires_at = agora + ttl if ttl is not None else None
+        conn = self._conn()
+        if nx:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, agora))
+                gravou = conn.execute(
+                    "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                ).rowcount == 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            gravou = True
+        self._limpar_expirados()
+        return gravou
+
+    def _limpar_expirados(self):
+        self._escritas += 1
+        if self._escritas % 1000:
+            return
+        agora = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (agora,))
+        conn.execute("DELETE FROM cache_events WHERE created_at < ?", (agora - SQLITE_EVENTS_RETENTION,))
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def release_lock(self, key, token):
+        self._conn().execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, token.encode()))
+
+    def publish(self, channel, message):
+        self._conn().execute(
+            "INSERT INTO cache_events (channel, message, created_at) VALUES (?, ?, ?)",
+            (channel, message, time.time()),
+        )
+        self._limpar_expirados()
+
+    def subscribe(self, channel):
+        return _SQLiteSubscription(self, channel)
+
+    def reserve_token(self, key, rate, burst):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            agora = time.time()
+            row = conn.execute("SELECT tokens, ts FROM cache_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, ts = row if row else (burst, agora)
+            tokens = min(burst, tokens + (agora - ts) * rate) - 1
+            conn.execute("INSERT OR REPLACE INTO cache_buckets (key, tokens, ts) VALUES (?, ?, ?)", (key, tokens, agora))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return max(0.0, -tokens / rate)
+
+    def incr_metrics(self, valores):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO cache_metrics (field, value) VALUES (?, ?) "
+                "ON CONFLICT(field) DO UPDATE SET value = value + excluded.value",
+                list(valores.items()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read_metrics(self):
+        return dict(self._conn().execute("SELECT field, value FROM cache_metrics").fetchall())
+
+
+class TieredBackend(CacheBackend):
+    """
+    Camada local (ex: SQLite do host) na frente de um backend compartilhado
+    (Redis). Leituras tentam a camada local primeiro; escritas, locks, pub/sub
+    e métricas vão para o backend compartilhado.
+    """
+
+    nome = "tiered"
+
+    def __init__(self, local: CacheBackend, remoto: CacheBackend, local_ttl: int = LOCAL_TIER_TTL):
+        self.local = local
+        self.remoto = remoto
+        self.local_ttl = local_ttl
+
+    def _ttl_local(self, ttl):
+        return self.local_ttl if ttl is None else min(ttl, self.local_ttl)
+
+    def _copiar_local(self, key, value, ttl):
+        # A cópia não pode durar mais que a entrada remota: a expiração no
+        # backend compartilhado não gera invalidação para os outros hosts
+        ttl = self._ttl_local(ttl)
+        if ttl <= 0:
+            return
+        try:
+            self.local.set(key, value, ttl)
+        except Exception as e:
+            logger.warning("Falha ao gravar %s na camada local: %s", key, e)
+
+    def get(self, key):
+        return self.mget([key])[0]
+
+    def mget(self, keys):
+        valores = self.local.mget(keys)
+        faltando = [key for key, value in zip(keys, valores) if value is None]
+        if faltando:
+            remotos = dict(zip(faltando, self.remoto.mget_ttl(faltando)))
+            for i, key in enumerate(keys):
+                if valores[i] is None and key in remotos and remotos[key][0] is not None:
+                    valores[i], ttl = remotos[key]
+                    self._copiar_local(key, valores[i], ttl)
+        return valores
+
+    def set(self, key, value, ttl=None, nx=False):
+        gravou = self.remoto.set(key, value, ttl, nx)
+        if gravou:
+            self.local.set(key, value, self._ttl_local(ttl))
+        return gravou
+
+    def exists(self, key):
+        return self.remoto.exists(key)
+
+    def delete(self, key):
+        self.remoto.delete(key)
+        self.local.delete(key)
+
+    def acquire_lock(self, key, token, ttl):
+        return self.remoto.acquire_lock(key, token, ttl)
+
+    def release_lock(self, key, token):
+        self.remoto.release_lock(key, token)
+
+    def publish(self, channel, message):
+        self.remoto.publish(channel, message)
+
+    def subscribe(self, channel):
+        return self.remoto.subscribe(channel)
+
+    def invalidate_local(self, key):
+        self.local.delete(key)
+
+    def reserve_token(self, key, rate, burst):
+        return self.remoto.reserve_token(key, rate, burst)
+
+    def incr_metrics(self, valores):
+        self.remoto.incr_metrics(valores)
+
+    def read_metrics(self):
+        return self.remoto.read_metrics()
+
+
+def criar_backend(nome: str = None) -> CacheBackend:
+    """
+    Cria o backend configurado em CACHE_BACKEND.
+
+    :param nome: redis, memory, sqlite ou tiered (SQLite local + Redis)
+    """
+    nome = nome or CACHE_BACKEND
+    if nome == "redis":
+        return RedisBackend()
+    if nome == "memory":
+        return MemoryBackend()
+    if nome == "sqlite":
+        return SQLiteBackend()
+    if nome == "tiered":
+        return TieredBackend(SQLiteBackend(), RedisBackend())
+    raise ValueError(f"CACHE_BACKEND inválido: {nome}. Opções: redis, memory, sqlite, tiered")
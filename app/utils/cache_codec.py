@@ -0,0 +1,226 @@
+import json
+import os
+import struct
+import zlib
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Formato das entradas: MAGIC + versão + serializador + compressão + payload.
+# Entradas antigas (JSON puro, gravadas antes do codec) nunca começam com \x00.
+#
+# Versão 1: payload = valor serializado (opcionalmente comprimido).
+# Versão 2: valores com DataFrames. payload = tamanho do valor (uint32) +
+#           quantidade de frames (uint32) + valor serializado + para cada frame
+#           tamanho (uint64) + stream Arrow IPC. No valor, cada DataFrame é
+#           substituído por {FRAME_MARKER: índice}.
+MAGIC = b"\x00RC"
+FORMAT_VERSION = 1
+FORMAT_VERSION_FRAMES = 2
+HEADER_SIZE = len(MAGIC) + 3
+FRAME_MARKER = "__frame__"
+
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+ZSTD_LEVEL = int(os.getenv("CACHE_ZSTD_LEVEL", 3))
+ZLIB_LEVEL = int(os.getenv("CACHE_ZLIB_LEVEL", 6))
+# Compressão interna dos buffers Arrow ("none" mantém a leitura sem cópia)
+ARROW_COMPRESSION = os.getenv("CACHE_ARROW_COMPRESSION", "zstd")
+
+
+class CodecError(Exception):
+    """Entrada de cache que não pode ser decodificada por este worker."""
+
+
+def _default(obj):
+    # Escalares numpy/pandas (np.int64, np.bool_, ...) e demais objetos
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+def _json_dumps(obj) -> bytes:
+    return json.dumps(obj, default=_default).encode("utf-8")
+
+
+def _orjson_dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _msgpack_dumps(obj) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes):
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# id -> (nome, dumps, loads). Os ids ficam gravados no Redis: não reutilizar.
+SERIALIZERS = {
+    0: ("json", _json_dumps, json.loads),
+    1: ("orjson", _orjson_dumps, orjson.loads if orjson else None),
+    2: ("msgpack", _msgpack_dumps, _msgpack_loads),
+}
+
+# id -> (nome, compress, decompress)
+COMPRESSORS = {
+    0: ("none", None, None),
+    1: ("zlib", lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress),
+    2: ("zstd", _zstd_compress, _zstd_decompress),
+}
+
+_AVAILABLE = {"orjson": orjson is not None, "msgpack": msgpack is not None, "zstd": zstandard is not None}
+
+
+def _resolve(options: dict, env: str, preferencia: list[str]) -> int:
+    """Escolhe o id configurado em `env` ou o primeiro disponível da lista de preferência."""
+    by_name = {nome: id_ for id_, (nome, *_) in options.items()}
+    nome = os.getenv(env)
+    if nome:
+        if nome not in by_name:
+            raise ValueError(f"{env} inválido: {nome}. Opções: {', '.join(by_name)}")
+        if not _AVAILABLE.get(nome, True):
+            raise ValueError(f"{env}={nome} requer a biblioteca correspondente instalada")
+        return by_name[nome]
+    return next(by_name[n] for n in preferencia if _AVAILABLE.get(n, True))
+
+
+SERIALIZER_ID = _resolve(SERIALIZERS, "CACHE_SERIALIZER", ["orjson", "msgpack", "json"])
+COMPRESSOR_ID = _resolve(COMPRESSORS, "CACHE_COMPRESSION", ["zstd", "zlib"])
+
+
+def _extrair_frames(obj, frames: list):
+    """Substitui DataFrames (em dicts/listas aninhados) por marcadores, acumulando-os em `frames`."""
+    if isinstance(obj, pd.DataFrame):
+        frames.append(obj)
+        return {FRAME_MARKER: len(frames) - 1}
+    if isinstance(obj, dict):
+        return {k: _extrair_frames(v, frames) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_extrair_frames(v, frames) for v in obj]
+    return obj
+
+
+def _restaurar_frames(obj, frames: list):
+    if isinstance(obj, dict):
+        if len(obj) == 1 and FRAME_MARKER in obj:
+            return frames[obj[FRAME_MARKER]]
+        return {k: _restaurar_frames(v, frames) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restaurar_frames(v, frames) for v in obj]
+    return obj
+
+
+def _frame_to_ipc(df: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    compression = None if ARROW_COMPRESSION == "none" else ARROW_COMPRESSION
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _ipc_to_frame(data: memoryview) -> pd.DataFrame:
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+
+def _serializar(payload: bytes) -> tuple[int, bytes]:
+    compressor_id = 0
+    if COMPRESSOR_ID and len(payload) >= COMPRESS_MIN_BYTES:
+        payload = COMPRESSORS[COMPRESSOR_ID][1](payload)
+        compressor_id = COMPRESSOR_ID
+    return compressor_id, payload
+
+
+def encode(obj) -> bytes:
+    """
+    Serializa um valor para gravação no cache, comprimindo acima de COMPRESS_MIN_BYTES.
+    DataFrames contidos no valor são gravados como Arrow IPC.
+
+    :param obj: Valor já convertido para tipos JSON (dict, list, str, números) ou DataFrames
+    :return: Bytes com cabeçalho de versão
+    """
+    frames = []
+    obj = _extrair_frames(obj, frames)
+    compressor_id, payload = _serializar(SERIALIZERS[SERIALIZER_ID][1](obj))
+
+    if not frames:
+        return MAGIC + bytes((FORMAT_VERSION, SERIALIZER_ID, compressor_id)) + payload
+
+    partes = [
+        MAGIC,
+        bytes((FORMAT_VERSION_FRAMES, SERIALIZER_ID, compressor_id)),
+        struct.pack("<II", len(payload), len(frames)),
+        payload,
+    ]
+    for df in frames:
+        ipc = _frame_to_ipc(df)
+        partes += [struct.pack("<Q", len(ipc)), ipc]
+    return b"".join(partes)
+
+
+def decode(data: bytes | str):
+    """
+    Decodifica uma entrada do cache, aceitando também o formato JSON legado.
+
+    :raises CodecError: Versão, serializador ou compressão desconhecidos ou indisponíveis
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+
+    version, serializer_id, compressor_id = data[len(MAGIC):HEADER_SIZE]
+    if version not in (FORMAT_VERSION, FORMAT_VERSION_FRAMES):
+        raise CodecError(f"Versão de formato desconhecida: {version}")
+    try:
+        _, _, loads = SERIALIZERS[serializer_id]
+        _, _, decompress = COMPRESSORS[compressor_id]
+    except KeyError:
+        raise CodecError(f"Codec desconhecido: serializador={serializer_id}, compressão={compressor_id}")
+
+    view = memoryview(data)
+    try:
+        if version == FORMAT_VERSION:
+            payload = view[HEADER_SIZE:]
+        else:
+            payload_size, n_frames = struct.unpack_from("<II", view, HEADER_SIZE)
+            inicio = HEADER_SIZE + 8
+            payload = view[inicio:inicio + payload_size]
+            offset = inicio + payload_size
+            frames = []
+            for _ in range(n_frames):
+                (size,) = struct.unpack_from("<Q", view, offset)
+                offset += 8
+                frames.append(_ipc_to_frame(view[offset:offset + size]))
+                offset += size
+
+        payload = decompress(payload) if decompress is not None else bytes(payload)
+        obj = loads(payload)
+        return obj if version == FORMAT_VERSION else _restaurar_frames(obj, frames)
+    except Exception as e:
+        # Biblioteca ausente neste worker (loads/decompress None) ou payload corrompido
+        raise CodecError(f"Falha ao decodificar entrada: {e}") from e
@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Métricas acumuladas em memória por worker e somadas periodicamente no backend
+# do cache, de onde o endpoint /metrics lê o agregado de todos os workers.
+FLUSH_INTERVAL = float(os.getenv("CACHE_METRICS_FLUSH", 5))
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# nome -> (tipo, descrição, buckets)
+METRICS = {
+    "cache_requests_total": ("counter", "Leituras do cache por resultado (l1_hit, hit, miss, force, stale, negative_hit)", None),
+    "cache_events_total": ("counter", "Eventos do cache (set, wait, lock_timeout, decode_error, revalidate_error, negative_set, partial_set, schema_migrate, schema_miss, not_modified, circuit_open, circuit_close, circuit_skip, hedge)", None),
+    "cache_fetch_seconds": ("histogram", "Duração das buscas na origem", SECONDS_BUCKETS),
+    "cache_encode_seconds": ("histogram", "Tempo de serialização das entradas", SECONDS_BUCKETS),
+    "cache_decode_seconds": ("histogram", "Tempo de desserialização das entradas", SECONDS_BUCKETS),
+    "cache_payload_bytes": ("histogram", "Tamanho das entradas gravadas e lidas no cache", BYTES_BUCKETS),
+}
+
+_valores: dict[str, float] = defaultdict(float)
+_lock = threading.Lock()
+_flusher_started = False
+_destino = None
+
+
+def prefixo(key: str) -> str:
+    """Rótulo da fonte de uma chave: acao:VALE3.SA -> acao, indices_bcb -> indices_bcb."""
+    return key.split(":", 1)[0]
+
+
+def _campo(nome: str, **labels) -> str:
+    return nome + "|" + ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+
+
+def contar(nome: str, key: str, valor: float = 1, **labels):
+    """Incrementa um contador para a fonte da chave."""
+    with _lock:
+        _valores[_campo(nome, prefix=prefixo(key), **labels)] += valor
+
+
+def observar(nome: str, key: str, valor: float):
+    """Registra uma observação em um histograma para a fonte da chave."""
+    buckets = METRICS[nome][2]
+    le = next((str(b) for b in buckets if valor <= b), "+Inf")
+    p = prefixo(key)
+    with _lock:
+        _valores[_campo(nome + "_bucket", prefix=p, le=le)] += 1
+        _valores[_campo(nome + "_sum", prefix=p)] += valor
+        _valores[_campo(nome + "_count", prefix=p)] += 1
+
+
+@contextmanager
+def cronometrar(nome: str, key: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, key, time.perf_counter() - inicio)
+
+
+def flush(backend):
+    """Soma os valores locais no agregado compartilhado do backend e zera o acumulado."""
+    with _lock:
+        pendentes = dict(_valores)
+        _valores.clear()
+    if not pendentes:
+        return
+    try:
+        backend.incr_metrics(pendentes)
+    except Exception as e:
+        logger.warning("Falha ao enviar métricas do cache: %s", e)
+        with _lock:
+            for campo, valor in pendentes.items():
+                _valores[campo] += valor
+
+
+def _flush_periodico():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush(_destino)
+
+
+def iniciar(backend):
+    """Inicia (uma vez por processo) a thread que envia as métricas ao backend."""
+    global _flusher_started, _destino
+    _destino = backend
+    if _flusher_started:
+        return
+    with _lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+    threading.Thread(target=_flush_periodico, name="cache-metrics", daemon=True).start()
+
+
+def _parse_campo(campo: str) -> tuple[str, dict]:
+    nome, _, labels = campo.partition("|")
+    return nome, dict(item.split("=", 1) for item in labels.split(",") if item)
+
+
+def _formatar(nome: str, labels: dict, valor: float) -> str:
+    rotulos = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    return f"{nome}{{{rotulos}}} {valor:g}"
+
+
+def render(backend) -> str:
+    """
+    Gera o texto no formato de exposição do Prometheus com o agregado de todos
+    os workers, incluindo a taxa de acerto por fonte.
+    """
+    flush(backend)
+    series = defaultdict(list)
+    for campo, valor in backend.read_metrics().items():
+        nome, labels = _parse_campo(campo)
+        series[nome].append((labels, valor))
+
+    linhas = []
+    for nome, (tipo, descricao, buckets) in METRICS.items():
+        linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} {tipo}"]
+        if tipo == "counter":
+            for labels, valor in sorted(series[nome], key=lambda s: sorted(s[0].items())):
+                linhas.append(_formatar(nome, labels, valor))
+            continue
+
+        # Buckets são gravados não cumulativos; o Prometheus espera cumulativos
+        por_prefixo = defaultdict(dict)
+        for labels, valor in series[nome + "_bucket"]:
+            por_prefixo[labels["prefix"]][labels["le"]] = valor
+        for labels, valor in series[nome + "_count"]:
+            por_prefixo.setdefault(labels["prefix"], {})
+        for p in sorted(por_prefixo):
+            acumulado = 0
+            for le in [str(b) for b in buckets] + ["+Inf"]:
+                acumulado += por_prefixo[p].get(le, 0)
+                linhas.append(_formatar(nome + "_bucket", {"prefix": p, "le": le}, acumulado))
+            for sufixo in ("_sum", "_count"):
+                valor = next((v for l, v in series[nome + sufixo] if l["prefix"] == p), 0)
+                linhas.append(_formatar(nome + sufixo, {"prefix": p}, valor))
+
+    hits = defaultdict(float)
+    total = defaultdict(float)
+    for labels, valor in series["cache_requests_total"]:
+        total[labels["prefix"]] += valor
+        if labels.get("result") in ("l1_hit", "hit", "stale"):
+            hits[labels["prefix"]] += valor
+    linhas += ["# HELP cache_hit_ratio Fração das leituras atendidas pelo cache", "# TYPE cache_hit_ratio gauge"]
+    for p in sorted(total):
+        linhas.append(_formatar("cache_hit_ratio", {"prefix": p}, round(hits[p] / total[p], 4) if total[p] else 0))
+
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,58 @@
+from typing import Callable
+
+# Versão do formato dos dados de cada fonte (prefixo da chave, ex: "acao").
+# A versão fica gravada no envelope da entrada; entradas sem versão (gravadas
+# antes do registro) são da versão 1. Ao mudar a estrutura retornada pela busca
+# de uma fonte, incremente a versão e, se possível, registre a migração.
+VERSAO_INICIAL = 1
+
+_versoes: dict[str, int] = {}
+_migracoes: dict[str, dict[int, Callable]] = {}
+
+
+class SchemaIncompativel(Exception):
+    """Entrada gravada em uma versão sem migração para a versão atual."""
+
+
+def _prefixo(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def registrar(prefixo: str, versao: int, migracoes: dict[int, Callable] | None = None):
+    """
+    Registra a versão atual do schema de uma fonte.
+
+    :param prefixo: Prefixo das chaves da fonte, ex: "fiiscom"
+    :param versao: Versão atual
+    :param migracoes: versão antiga -> função que converte o valor para a versão
+                      seguinte. Versões sem migração são rebuscadas na origem;
+                      use `lambda v: v` quando o valor antigo continua legível.
+    """
+    _versoes[prefixo] = versao
+    _migracoes[prefixo] = dict(migracoes or {})
+
+
+def registrado(key: str) -> bool:
+    return _prefixo(key) in _versoes
+
+
+def versao_atual(key: str) -> int:
+    return _versoes.get(_prefixo(key), VERSAO_INICIAL)
+
+
+def migrar(key: str, valor, versao: int):
+    """
+    Converte um valor gravado na `versao` para a versão atual da fonte.
+
+    :raises SchemaIncompativel: Versão futura (gravada por um deploy mais novo)
+                                ou sem migração registrada
+    """
+    atual = versao_atual(key)
+    if versao > atual:
+        raise SchemaIncompativel(f"{key}: versão {versao} é mais nova que a atual ({atual})")
+    migracoes = _migracoes.get(_prefixo(key), {})
+    for v in range(versao, atual):
+        if v not in migracoes:
+            raise SchemaIncompativel(f"{key}: sem migração da versão {v} para {v + 1}")
+        valor = migracoes[v](valor)
+    return valor
@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from app.utils import cache_metrics as metrics
+from app.utils import rate_limit, redis_cache
+from app.utils.upstream_errors import CircuitOpenError, TickerNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker por fonte externa. Cada worker acompanha as buscas recentes
+# da fonte (janela de CIRCUIT_JANELA segundos); com ao menos
+# CIRCUIT_MIN_REQUISICOES buscas, se a fração de falhas passar de
+# CIRCUIT_TAXA_ERRO, ou a de buscas mais lentas que CIRCUIT_LATENCIA segundos
+# passar de CIRCUIT_TAXA_LENTAS, o circuito é aberto no backend do cache e
+# vale para todos os workers: por CIRCUIT_ABERTO segundos as buscas falham na
+# hora com CircuitOpenError. Depois disso uma única busca de teste (meio
+# aberto) decide entre fechar o circuito e abrir de novo.
+#
+# O tempo aguardado no limite de requisições (rate_limit) não conta como
+# lentidão. CIRCUIT_ABERTO=0 desativa o breaker.
+JANELA = float(os.getenv("CIRCUIT_JANELA", 60))
+MIN_REQUISICOES = int(os.getenv("CIRCUIT_MIN_REQUISICOES", 10))
+TAXA_ERRO = float(os.getenv("CIRCUIT_TAXA_ERRO", 0.5))
+LATENCIA = float(os.getenv("CIRCUIT_LATENCIA", 10))
+TAXA_LENTAS = float(os.getenv("CIRCUIT_TAXA_LENTAS", 0.5))
+ABERTO = int(os.getenv("CIRCUIT_ABERTO", 30))
+
+# Latências recentes das buscas bem-sucedidas, base do prazo de hedge
+AMOSTRAS_LATENCIA = 200
+MIN_AMOSTRAS_HEDGE = 20
+
+_janelas: dict[str, deque] = defaultdict(deque)
+_latencias: dict[str, deque] = defaultdict(lambda: deque(maxlen=AMOSTRAS_LATENCIA))
+_lock = threading.Lock()
+
+
+def estado_key(nome: str) -> str:
+    return f"circuito:{nome}"
+
+
+def _teste_key(nome: str) -> str:
+    return f"circuito:{nome}:teste"
+
+
+def _ler_estado(nome: str) -> dict | None:
+    try:
+        valor = redis_cache.backend.get(estado_key(nome))
+    except Exception as e:
+        # Sem o backend, o circuito fica fechado em vez de bloquear a fonte
+        logger.warning("Falha ao ler o circuit breaker de %s: %s", nome, e)
+        return None
+    return json.loads(valor) if valor else None
+
+
+def _abrir(nome: str, motivo: str):
+    estado = {"aberto_ate": time.time() + ABERTO, "motivo": motivo}
+    try:
+        # A chave dura mais que o período aberto: depois dele o circuito fica meio aberto
+        redis_cache.backend.set(estado_key(nome), json.dumps(estado).encode(), ABERTO * 10)
+        redis_cache.backend.delete(_teste_key(nome))
+    except Exception as e:
+        logger.warning("Falha ao abrir o circuit breaker de %s: %s", nome, e)
+        return
+    with _lock:
+        _janelas[nome].clear()
+    metrics.contar("cache_events_total", nome, event="circuit_open")
+    logger.warning("Circuit breaker de %s aberto por %ds (%s)", nome, ABERTO, motivo)
+
+
+def _fechar(nome: str):
+    try:
+        redis_cache.backend.delete(estado_key(nome))
+        redis_cache.backend.delete(_teste_key(nome))
+    except Exception as e:
+        logger.warning("Falha ao fechar o circuit breaker de %s: %s", nome, e)
+        return
+    metrics.contar("cache_events_total", nome, event="circuit_close")
+    logger.info("Circuit breaker de %s fechado", nome)
+
+
+def iniciar_busca(nome: str) -> bool:
+    """
+    Verifica o circuito antes de uma busca na fonte. Com o circuito meio
+    aberto, apenas um worker é liberado, para a busca de teste.
+
+    :return: True se a busca é a de teste do circuito meio aberto
+    :raises CircuitOpenError: Se o circuito está aberto
+    """
+    if ABERTO <= 0:
+        return False
+    estado = _ler_estado(nome)
+    if estado is None:
+        return False
+    # Falhas anteriores à abertura não devem reabrir o circuito
+    with _lock:
+        _janelas[nome].clear()
+    if time.time() >= estado["aberto_ate"]:
+        try:
+            if redis_cache.backend.set(_teste_key(nome), b"1", ABERTO, nx=True):
+                logger.info("Circuit breaker de %s meio aberto: busca de teste", nome)
+                return True
+        except Exception as e:
+            logger.warning("Falha ao reservar a busca de teste de %s: %s", nome, e)
+    metrics.contar("cache_events_total", nome, event="circuit_skip")
+    raise CircuitOpenError(f"{nome}: circuit breaker aberto", nome)
+
+
+def registrar(nome: str, sucesso: bool, duracao: float, teste: bool = False):
+    """
+    Registra o resultado de uma busca e abre o circuito se a fonte estiver
+    falhando ou lenta demais.
+
+    :param duracao: Segundos da busca, sem a espera no limite de requisições
+    :param teste: Se True, a busca era o teste do circuito meio aberto
+    """
+    if ABERTO <= 0:
+        return
+    lenta = duracao > LATENCIA
+    if teste:
+        if sucesso and not lenta:
+            _fechar(nome)
+        else:
+            _abrir(nome, "falha na busca de teste" if not sucesso else f"busca de teste levou {duracao:.1f}s")
+        return
+
+    agora = time.monotonic()
+    with _lock:
+        if sucesso:
+            _latencias[nome].append(duracao)
+        janela = _janelas[nome]
+        janela.append((agora, not sucesso, lenta))
+        while janela and janela[0][0] < agora - JANELA:
+            janela.popleft()
+        if sucesso and not lenta or len(janela) < MIN_REQUISICOES:
+            return
+        total = len(janela)
+        falhas = sum(1 for _, falha, _ in janela if falha)
+        lentas = sum(1 for _, _, l in janela if l)
+    if falhas / total >= TAXA_ERRO:
+        _abrir(nome, f"{falhas}/{total} buscas com falha")
+    elif lentas / total >= TAXA_LENTAS:
+        _abrir(nome, f"{lentas}/{total} buscas acima de {LATENCIA:g}s")
+
+
+def percentil_latencia(nome: str, percentil: float) -> float | None:
+    """
+    Latência (segundos) das buscas bem-sucedidas recentes da fonte no percentil
+    dado, ou None se ainda não há amostras suficientes neste worker.
+    """
+    with _lock:
+        amostras = sorted(_latencias[nome])
+    if len(amostras) < MIN_AMOSTRAS_HEDGE:
+        return None
+    return amostras[min(len(amostras) - 1, int(len(amostras) * percentil / 100))]
+
+
+def _falhou(e: Exception) -> bool:
+    # Ticker inexistente é uma resposta válida da fonte. Qualquer outra exceção
+    # conta como falha, inclusive as que from_exception não soube classificar
+    return not isinstance(e, TickerNotFoundError)
+
+
+def protegido(nome: str):
+    """
+    Decorator das funções de busca na origem (síncronas ou assíncronas):
+    falha com CircuitOpenError enquanto o circuito da fonte estiver aberto e
+    registra o resultado e a duração das buscas feitas.
+
+    :param nome: Nome da fonte, o mesmo usado nos UpstreamError (ex: "fiiscom")
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                teste = await asyncio.to_thread(iniciar_busca, nome)
+                inicio = time.perf_counter()
+                sucesso = None
+                with rate_limit.contabilizar_espera() as espera:
+                    try:
+                        resultado = await fn(*args, **kwargs)
+                        sucesso = True
+                        return resultado
+                    except Exception as e:
+                        sucesso = not _falhou(e)
+                        raise
+                    finally:
+                        # Busca cancelada (sucesso None) não diz nada sobre a fonte
+                        if sucesso is not None:
+                            duracao = time.perf_counter() - inicio - espera[0]
+                            await asyncio.to_thread(registrar, nome, sucesso, duracao, teste)
+            return wrapper_async
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            teste = iniciar_busca(nome)
+            inicio = time.perf_counter()
+            sucesso = None
+            with rate_limit.contabilizar_espera() as espera:
+                try:
+                    resultado = fn(*args, **kwargs)
+                    sucesso = True
+                    return resultado
+                except Exception as e:
+                    sucesso = not _falhou(e)
+                    raise
+                finally:
+                    if sucesso is not None:
+                        registrar(nome, sucesso, time.perf_counter() - inicio - espera[0], teste)
+        return wrapper
+
+    return decorator
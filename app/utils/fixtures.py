@@ -0,0 +1,320 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from glob import glob
+from urllib.parse import urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.utils.cache_codec import decode, encode
+
+logger = logging.getLogger(__name__)
+
+# Gravação e reprodução das respostas das fontes externas (fiis.com.br,
+# Investidor10, Banco Central e Yahoo Finance), para exercitar serviços e
+# rotas sem internet, em benchmarks determinísticos e no CI.
+#
+# UPSTREAM_FIXTURES=record: as requisições vão à origem e cada resposta é
+#   gravada em UPSTREAM_FIXTURES_DIR (um arquivo por requisição).
+# UPSTREAM_FIXTURES=replay: nenhuma requisição sai do processo; as respostas
+#   vêm dos arquivos gravados, após UPSTREAM_FIXTURES_LATENCIA segundos
+#   ("0.2" para todas as fontes ou "yahoo=0.5,fiis.com.br=0.1,*=0.05").
+#
+# As requisições HTTP passam pelo http_client (adapter da Session e aget); as
+# do yfinance, por yf.Ticker e yf.download, substituídos em instalar().
+MODO = os.getenv("UPSTREAM_FIXTURES", "").lower()
+DIRETORIO = os.getenv("UPSTREAM_FIXTURES_DIR", "fixtures/upstream")
+
+# Versão do formato dos arquivos. Arquivos de outra versão precisam ser regravados
+FORMATO = 1
+
+SERIE_MARKER = "__serie__"
+
+
+class FixtureAusenteError(LookupError):
+    """Requisição sem resposta gravada no modo replay."""
+
+
+def _parse_latencias(valor: str) -> dict[str, float]:
+    latencias = {}
+    for item in filter(None, (parte.strip() for parte in valor.split(","))):
+        fonte, _, segundos = item.rpartition("=")
+        latencias[fonte.strip().lower() or "*"] = float(segundos)
+    return latencias
+
+
+LATENCIAS = _parse_latencias(os.getenv("UPSTREAM_FIXTURES_LATENCIA", "0"))
+
+
+def gravando() -> bool:
+    return MODO == "record"
+
+
+def reproduzindo() -> bool:
+    return MODO == "replay"
+
+
+def latencia(fonte: str) -> float:
+    """Latência injetada (segundos) nas respostas reproduzidas da fonte; vale também para subdomínios."""
+    fonte = fonte.lower()
+    for nome, segundos in LATENCIAS.items():
+        if fonte == nome or fonte.endswith("." + nome):
+            return segundos
+    return LATENCIAS.get("*", 0.0)
+
+
+def _slug(texto: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", texto).strip("_")[:80]
+
+
+def _glob_escape(texto: str) -> str:
+    return re.sub(r"([*?[])", r"[\1]", texto)
+
+
+def _gravacoes(fonte: str, grupo: str) -> list[str]:
+    """Arquivos gravados do grupo (e de grupos com o mesmo slug)."""
+    return sorted(glob(os.path.join(DIRETORIO, _slug(fonte), f"{_glob_escape(_slug(grupo))}-*.bin")))
+
+
+def _caminho(fonte: str, grupo: str, chave: str) -> str:
+    digest = hashlib.sha1(chave.encode()).hexdigest()[:12]
+    return os.path.join(DIRETORIO, _slug(fonte), f"{_slug(grupo)}-{digest}.bin")
+
+
+def _para_arquivo(valor):
+    # O codec grava DataFrames; Series viram DataFrame de uma coluna
+    if isinstance(valor, pd.Series):
+        return {SERIE_MARKER: valor.to_frame(name=0), "nome": valor.name}
+    if isinstance(valor, dict):
+        return {k: _para_arquivo(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_para_arquivo(v) for v in valor]
+    return valor
+
+
+def _de_arquivo(valor):
+    if isinstance(valor, dict):
+        if SERIE_MARKER in valor:
+            serie = valor[SERIE_MARKER].iloc[:, 0]
+            serie.name = valor["nome"]
+            return serie
+        return {k: _de_arquivo(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_de_arquivo(v) for v in valor]
+    return valor
+
+
+def gravar(fonte: str, chave: str, valor, grupo: str | None = None):
+    """
+    Grava a resposta de uma requisição à fonte.
+
+    :param chave: Identifica a requisição (ex: método e URL completa)
+    :param grupo: Requisições equivalentes com parâmetros diferentes (ex: URL sem
+                  a query); usado no replay quando não há gravação exata
+    """
+    grupo = grupo or chave
+    caminho = _caminho(fonte, grupo, chave)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    dados = {
+        "formato": FORMATO,
+        "fonte": fonte,
+        "chave": chave,
+        "grupo": grupo,
+        "gravado_em": datetime.now().isoformat(timespec="seconds"),
+        "valor": _para_arquivo(valor),
+    }
+    with open(caminho, "wb") as f:
+        f.write(encode(dados))
+    logger.debug("Fixture gravado: %s", caminho)
+
+
+def _abrir(caminho: str) -> dict:
+    with open(caminho, "rb") as f:
+        dados = decode(f.read())
+    if dados.get("formato") != FORMATO:
+        raise FixtureAusenteError(
+            f"{caminho}: formato {dados.get('formato')} (esperado {FORMATO}); grave novamente com UPSTREAM_FIXTURES=record"
+        )
+    return dados
+
+
+def ler(fonte: str, chave: str, grupo: str | None = None):
+    """
+    Lê a resposta gravada para a requisição: a gravação exata da chave ou, na
+    falta dela, a mais recente do mesmo grupo.
+
+    :raises FixtureAusenteError: Nenhuma gravação da requisição
+    """
+    grupo = grupo or chave
+    caminho = _caminho(fonte, grupo, chave)
+    if os.path.exists(caminho):
+        return _de_arquivo(_abrir(caminho)["valor"])
+    gravacoes = [dados for dados in map(_abrir, _gravacoes(fonte, grupo)) if dados["grupo"] == grupo]
+    if not gravacoes:
+        raise FixtureAusenteError(f"Sem gravação para {fonte} {chave}; grave com UPSTREAM_FIXTURES=record")
+    return _de_arquivo(max(gravacoes, key=lambda dados: dados["gravado_em"])["valor"])
+
+
+# --- HTTP (requests e aiohttp) ---
+
+def _chave_http(metodo: str, url: str) -> tuple[str, str, str]:
+    """(fonte, chave, grupo) da requisição: grupo é a URL sem a query (ex: datas da série do BCB)."""
+    partes = urlsplit(url)
+    return partes.hostname or "", f"{metodo} {url}", f"{metodo} {partes.scheme}://{partes.netloc}{partes.path}"
+
+
+def gravar_http(metodo: str, url: str, status: int, headers, corpo: bytes, encoding: str | None,
+                url_final: str, reason: str | None = None):
+    """Grava uma resposta HTTP. 304 não é gravado: o replay precisa da página (ver revalidacao)."""
+    if status == 304:
+        return
+    fonte, chave, grupo = _chave_http(metodo, url)
+    gravar(fonte, chave, {
+        "status": status,
+        "reason": reason,
+        "url": url_final,
+        "headers": {str(k): str(v) for k, v in headers.items()},
+        "corpo": base64.b64encode(corpo).decode("ascii"),
+        "encoding": encoding,
+    }, grupo)
+
+
+def _ler_http(metodo: str, url: str) -> tuple[str, dict]:
+    fonte, chave, grupo = _chave_http(metodo, url)
+    return fonte, ler(fonte, chave, grupo)
+
+
+class AdaptadorFixtures(BaseAdapter):
+    """
+    Adapter da Session do http_client: no replay responde com as gravações,
+    no record repassa ao adapter real e grava as respostas.
+    """
+
+    def __init__(self, real: BaseAdapter):
+        super().__init__()
+        self.real = real
+
+    def send(self, request, **kwargs):
+        if gravando():
+            resp = self.real.send(request, **kwargs)
+            gravar_http(request.method, request.url, resp.status_code, resp.headers, resp.content,
+                        resp.encoding, resp.url, resp.reason)
+            return resp
+
+        fonte, gravada = _ler_http(request.method, request.url)
+        time.sleep(latencia(fonte))
+        resp = requests.Response()
+        resp.status_code = gravada["status"]
+        resp.url = gravada["url"]
+        resp.headers = CaseInsensitiveDict(gravada["headers"])
+        resp._content = base64.b64decode(gravada["corpo"])
+        resp.encoding = gravada["encoding"]
+        resp.reason = gravada["reason"]
+        resp.request = request
+        return resp
+
+    def close(self):
+        self.real.close()
+
+
+async def responder_async(url: str, encoding: str | None = None):
+    """Resposta gravada para aget (modo replay), no formato de http_client.RespostaAsync."""
+    from app.utils.http_client import RespostaAsync
+
+    fonte, gravada = await asyncio.to_thread(_ler_http, "GET", url)
+    await asyncio.sleep(latencia(fonte))
+    corpo = base64.b64decode(gravada["corpo"])
+    texto = corpo.decode(encoding or gravada["encoding"] or "utf-8", errors="replace")
+    return RespostaAsync(gravada["status"], gravada["url"], CaseInsensitiveDict(gravada["headers"]), texto)
+
+
+# --- yfinance ---
+
+FONTE_YAHOO = "yahoo"
+
+
+def _gravado_ou_real(chave: str, grupo: str, buscar):
+    if reproduzindo():
+        valor = ler(FONTE_YAHOO, chave, grupo)
+        time.sleep(latencia(FONTE_YAHOO))
+        return valor
+    valor = buscar()
+    gravar(FONTE_YAHOO, chave, valor, grupo)
+    return valor
+
+
+class TickerFixture:
+    """
+    Substituto de yf.Ticker: cada atributo lido (info, dividends,
+    income_stmt, ...) ou método chamado é gravado/reproduzido separadamente.
+    """
+
+    def __init__(self, ticker: str, *args, **kwargs):
+        self.ticker = ticker.upper()
+        self._args = args
+        self._kwargs = kwargs
+        self._real = None
+
+    def _ticker_real(self):
+        if self._real is None:
+            self._real = _TICKER_REAL(self.ticker, *self._args, **self._kwargs)
+        return self._real
+
+    def __getattr__(self, nome: str):
+        if nome.startswith("_"):
+            raise AttributeError(nome)
+        grupo = f"Ticker {self.ticker} {nome}"
+        if reproduzindo():
+            # Métodos (ex: history) são gravados por chamada, em um grupo próprio
+            if _gravacoes(FONTE_YAHOO, f"{grupo} call"):
+                return self._metodo(nome, grupo)
+            return _gravado_ou_real(grupo, grupo, None)
+
+        atributo = getattr(self._ticker_real(), nome)
+        if callable(atributo):
+            return self._metodo(nome, grupo)
+        gravar(FONTE_YAHOO, grupo, atributo)
+        return atributo
+
+    def _metodo(self, nome: str, grupo: str):
+        def chamar(*args, **kwargs):
+            chave = f"{grupo}({args!r}, {sorted(kwargs.items())!r})"
+            return _gravado_ou_real(chave, f"{grupo} call", lambda: getattr(self._ticker_real(), nome)(*args, **kwargs))
+        return chamar
+
+
+def download_fixture(tickers, *args, **kwargs):
+    """Substituto de yf.download. Sem gravação exata (ex: outra data inicial), usa a dos mesmos tickers."""
+    lista = sorted(t.upper() for t in ([tickers] if isinstance(tickers, str) else tickers))
+    grupo = f"download {' '.join(lista)}"
+    parametros = {k: v for k, v in kwargs.items() if k not in ("progress", "threads")}
+    chave = f"{grupo} {args!r} {sorted(parametros.items())!r}"
+    return _gravado_ou_real(chave, grupo, lambda: _DOWNLOAD_REAL(tickers, *args, **kwargs))
+
+
+_TICKER_REAL = None
+_DOWNLOAD_REAL = None
+
+
+def instalar():
+    """
+    Ativa a gravação/reprodução do yfinance conforme UPSTREAM_FIXTURES (o
+    http_client consulta o modo diretamente). Sem o modo definido não faz nada.
+    """
+    global _TICKER_REAL, _DOWNLOAD_REAL
+    if MODO not in ("record", "replay") or _TICKER_REAL is not None:
+        return
+    import yfinance
+
+    _TICKER_REAL, _DOWNLOAD_REAL = yfinance.Ticker, yfinance.download
+    yfinance.Ticker = TickerFixture
+    yfinance.download = download_fixture
+    logger.warning("Fontes externas em modo %s (%s)", MODO, DIRETORIO)
@@ -0,0 +1,37 @@
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Parser dos scrapers: lxml (bem mais rápido) se estiver instalado, senão o
+# html.parser da biblioteca padrão. HTML_PARSER força um deles.
+
+
+def _resolver_parser() -> str:
+    preferido = os.getenv("HTML_PARSER")
+    if preferido:
+        return preferido
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+PARSER = _resolver_parser()
+
+
+def classes(attrs: dict) -> set[str]:
+    """Classes CSS de uma tag, a partir dos atributos recebidos pelo filtro de parse."""
+    valor = attrs.get("class") or ""
+    return set(valor.split()) if isinstance(valor, str) else set(valor)
+
+
+def parse(html: str, alvo=None) -> BeautifulSoup:
+    """
+    Monta a árvore do HTML, opcionalmente apenas com os elementos de interesse.
+
+    :param alvo: Função (nome, atributos) -> bool. Tags aceitas são mantidas com
+                 toda a subárvore; o restante do documento é descartado sem
+                 gerar objetos. None = documento inteiro
+    """
+    return BeautifulSoup(html, PARSER, parse_only=SoupStrainer(alvo) if alvo is not None else None)
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils import fixtures, rate_limit
+
+# Cliente HTTP compartilhado pelos scrapers (fiis.com.br, Investidor10, BCB).
+# As conexões ficam abertas (keep-alive) em um pool por host com até
+# HTTP_MAX_POR_HOST conexões. No cliente síncrono, requisições além disso abrem
+# conexões avulsas em vez de aguardar: o requests não tem prazo para esperar
+# uma conexão do pool, e uma thread poderia ficar presa indefinidamente. O
+# volume por host é controlado pelo limite de requisições (rate_limit).
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 20))
+MAX_POR_HOST = int(os.getenv("HTTP_MAX_POR_HOST", 4))
+MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", 10))
+RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+
+STATUS_RETRY = (429, 500, 502, 503, 504)
+
+# Falhas transitórias repetidas com backoff exponencial (0.5s, 1s, 2s, ...),
+# respeitando o Retry-After. Esgotadas as tentativas, a última resposta é
+# devolvida para ser classificada (ver upstream_errors.raise_for_status).
+# As tentativas são feitas aqui (get, aget), não pelo adapter: cada uma passa
+# pelo limite de requisições do host.
+
+# O adapter (e o pool de conexões) é único por processo; cada thread usa a
+# própria Session, já que Session não é segura entre threads.
+_adapter = HTTPAdapter(
+    pool_connections=MAX_HOSTS,
+    pool_maxsize=MAX_POR_HOST,
+    pool_block=False,
+    max_retries=0,
+)
+_local = threading.local()
+
+
+def sessao() -> requests.Session:
+    """Session da thread atual, montada sobre o pool compartilhado."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        # Com UPSTREAM_FIXTURES, as respostas são gravadas ou reproduzidas (ver fixtures)
+        adapter = fixtures.AdaptadorFixtures(_adapter) if fixtures.gravando() or fixtures.reproduzindo() else _adapter
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+    return session
+
+
+def _espera(tentativa: int, retry_after: str | None = None) -> float:
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return BACKOFF * (2 ** tentativa)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    Equivalente a requests.get usando o pool compartilhado, com retry,
+    timeout padrão (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT) e o limite de
+    requisições por host (ver rate_limit) em cada tentativa.
+
+    :raises requests.RequestException: Falha de conexão ou timeout após as tentativas
+    """
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    for tentativa in range(RETRIES + 1):
+        rate_limit.aguardar(url)
+        try:
+            resp = sessao().get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if tentativa == RETRIES:
+                raise
+            time.sleep(_espera(tentativa))
+            continue
+        if resp.status_code not in STATUS_RETRY or tentativa == RETRIES:
+            return resp
+        resp.close()
+        time.sleep(_espera(tentativa, resp.headers.get("Retry-After")))
+
+
+# --- Versão assíncrona (aiohttp) ---
+#
+# Mesmas regras do cliente síncrono, com uma ClientSession por event loop.
+
+# Exceções de rede do cliente assíncrono, equivalentes a requests.RequestException
+ERROS_REDE_ASYNC = (aiohttp.ClientError, asyncio.TimeoutError)
+
+_sessoes_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class RespostaAsync:
+    """Resposta já lida por aget, com os atributos usados pelos scrapers."""
+
+    def __init__(self, status_code: int, url: str, headers, text: str):
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers
+        self.text = text
+
+
+def _sessao_async() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _sessoes_async.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=MAX_POR_HOST),
+            timeout=aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+        )
+        _sessoes_async[loop] = session
+    return session
+
+
+async def aget(url: str, headers: dict | None = None, encoding: str | None = None) -> RespostaAsync:
+    """
+    GET assíncrono com pool por host, timeout padrão e retry com backoff.
+
+    :param encoding: Força a codificação do corpo (por padrão, a informada pelo servidor)
+    :raises aiohttp.ClientError | asyncio.TimeoutError: Falha de rede após as tentativas
+    """
+    if fixtures.reproduzindo():
+        await rate_limit.aguardar_async(url)
+        return await fixtures.responder_async(url, encoding)
+    for tentativa in range(RETRIES + 1):
+        await rate_limit.aguardar_async(url)
+        try:
+            async with _sessao_async().get(url, headers=headers) as resp:
+                text = await resp.text(encoding=encoding, errors="replace")
+                resposta = RespostaAsync(resp.status, str(resp.url), resp.headers, text)
+            if fixtures.gravando():
+                await asyncio.to_thread(fixtures.gravar_http, "GET", url, resposta.status_code, resposta.headers,
+                                        text.encode("utf-8"), "utf-8", resposta.url, resp.reason)
+        except ERROS_REDE_ASYNC:
+            if tentativa == RETRIES:
+                raise
+            await asyncio.sleep(_espera(tentativa))
+            continue
+        if resposta.status_code not in STATUS_RETRY or tentativa == RETRIES:
+            return resposta
+        await asyncio.sleep(_espera(tentativa, resposta.headers.get("Retry-After")))
+
+
+async def fechar_async():
+    """Fecha a sessão do event loop atual (ex: no encerramento da API)."""
+    session = _sessoes_async.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+from app.utils import redis_cache
+
+logger = logging.getLogger(__name__)
+
+# Limite de requisições por host de origem (token bucket), compartilhado pelos
+# workers através do backend do cache. Requisições além do limite aguardam a
+# vez em vez de falhar, então refreshes em massa seguem no ritmo sustentável.
+#
+# HTTP_RATE_HOSTS: "host=req_por_s:burst" separados por vírgula; vale também
+# para subdomínios. Demais hosts usam HTTP_RATE/HTTP_BURST (HTTP_RATE=0: sem limite).
+RATE = float(os.getenv("HTTP_RATE", 0))
+BURST = int(os.getenv("HTTP_BURST", 10))
+
+
+def _parse_limites(valor: str) -> dict[str, tuple[float, int]]:
+    limites = {}
+    for item in filter(None, (parte.strip() for parte in valor.split(","))):
+        host, _, limite = item.partition("=")
+        rate, _, burst = limite.partition(":")
+        limites[host.strip().lower()] = (float(rate), int(burst or 1))
+    return limites
+
+
+LIMITES = _parse_limites(os.getenv("HTTP_RATE_HOSTS", "fiis.com.br=2:5,investidor10.com.br=2:5"))
+
+# Espera acumulada pela busca em andamento (ver contabilizar_espera)
+_espera_atual: ContextVar[list[float] | None] = ContextVar("rate_limit_espera", default=None)
+
+
+@contextmanager
+def contabilizar_espera():
+    """
+    Soma o tempo aguardado no limite dentro do bloco (inclusive em threads e
+    tasks iniciadas nele). Usado para não contar a fila como lentidão da fonte.
+
+    :return: Lista de um elemento com os segundos aguardados
+    """
+    acumulado = [0.0]
+    token = _espera_atual.set(acumulado)
+    try:
+        yield acumulado
+    finally:
+        _espera_atual.reset(token)
+
+
+def limite(host: str) -> tuple[float, int]:
+    """Retorna (requisições por segundo, burst) do host."""
+    host = host.lower()
+    for dominio, valor in LIMITES.items():
+        if host == dominio or host.endswith("." + dominio):
+            return valor
+    return RATE, BURST
+
+
+def _reservar(url: str) -> float:
+    host = urlsplit(url).hostname or ""
+    rate, burst = limite(host)
+    if rate <= 0:
+        return 0.0
+    try:
+        espera = redis_cache.backend.reserve_token(f"ratelimit:{host}", rate, burst)
+    except Exception as e:
+        # Sem o backend, segue sem limite em vez de derrubar a requisição
+        logger.warning("Falha no limite de requisições de %s: %s", host, e)
+        return 0.0
+    if espera > 0:
+        logger.debug("Aguardando %.2fs pelo limite de requisições de %s", espera, host)
+        acumulado = _espera_atual.get()
+        if acumulado is not None:
+            acumulado[0] += espera
+    return espera
+
+
+def aguardar(url: str):
+    """Bloqueia até a requisição para o host de `url` estar dentro do limite."""
+    espera = _reservar(url)
+    if espera > 0:
+        time.sleep(espera)
+
+
+async def aguardar_async(url: str):
+    """Versão assíncrona de aguardar."""
+    espera = await asyncio.to_thread(_reservar, url)
+    if espera > 0:
+        await asyncio.sleep(espera)
@@ -1,22 +1,188 @@
-import redis
+import asyncio
 import json
+import logging
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 import pandas as pd
+from app.utils import cache_metrics as metrics
+from app.utils import cache_schema
+from app.utils.cache_backends import CacheBackend, criar_backend
+from app.utils.cache_codec import CodecError, decode, encode
+from app.utils.upstream_errors import ERRORS_BY_TIPO, UpstreamError
 
-# Conexão com Redis
-redis_host = os.getenv("REDIS_HOST", "localhost")
-redis_port = int(os.getenv("REDIS_PORT", 6379))
-redis_db = int(os.getenv("REDIS_DB", 0))
-redis_client = redis.StrictRedis(host=redis_host, port=redis_port, db=redis_db, decode_responses=True)
+logger = logging.getLogger(__name__)
 
-def _safe_dict(df: pd.DataFrame) -> dict:
+# Armazenamento do cache (Redis por padrão; ver CACHE_BACKEND em cache_backends).
+# Nenhum backend abre conexão antes do primeiro uso.
+backend: CacheBackend = criar_backend()
+
+# Single-flight: tempo máximo (s) que o lock de busca fica com um worker e
+# tempo máximo (s) que os demais esperam pelo resultado antes de buscar sozinhos.
+LOCK_TIMEOUT = int(os.getenv("CACHE_LOCK_TIMEOUT", 30))
+LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", 30))
+LOCK_POLL = 0.2
+
+# Buscas em andamento neste processo, por chave.
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Cache L1: objetos já desserializados, por worker, na frente do backend.
+L1_MAXSIZE = int(os.getenv("CACHE_L1_MAXSIZE", 256))
+L1_TTL = float(os.getenv("CACHE_L1_TTL", 60))
+INVALIDATE_CHANNEL = "cache:invalidate"
+_worker_id = uuid.uuid4().hex
+
+
+class LRUCache:
+    """
+    Cache LRU em memória com TTL por entrada, seguro para uso entre threads.
+    Os valores são compartilhados entre chamadas e não devem ser alterados.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is self._MISSING:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+l1_cache = LRUCache(L1_MAXSIZE, L1_TTL)
+
+# Stale-while-revalidate: entradas gravadas com soft_ttl carregam o instante
+# em que passam a ser consideradas obsoletas; o TTL do backend é a expiração dura.
+ENTRY_MARKER = "__cache_entry__"
+# Entradas negativas: falhas classificadas da origem (UpstreamError), com TTL curto
+NEGATIVE_MARKER = "__negative__"
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CACHE_REFRESH_WORKERS", 4)),
+    thread_name_prefix="cache-refresh",
+)
+_revalidando: set[str] = set()
+
+# Resultados incompletos da origem (ver Parcial) ficam frescos por no máximo esse tempo (s)
+PARTIAL_SOFT_TTL = int(os.getenv("CACHE_PARTIAL_SOFT_TTL", 300))
+
+# Buscas simultâneas na origem por chamada de get_cached_many
+MANY_MAX_WORKERS = int(os.getenv("CACHE_MANY_MAX_WORKERS", 8))
+_listener_started = False
+_listener_lock = threading.Lock()
+
+
+def _escutar_invalidacoes():
+    """
+    Remove do L1 as chaves regravadas por outros workers. Reconecta em caso de
+    falha; enquanto desconectado, o TTL do L1 limita o tempo de dado obsoleto.
+    """
+    while True:
+        sub = None
+        try:
+            sub = backend.subscribe(INVALIDATE_CHANNEL)
+            for message in sub.listen():
+                data = json.loads(message)
+                if data.get("worker") != _worker_id:
+                    l1_cache.delete(data["key"])
+                    backend.invalidate_local(data["key"])
+        except Exception as e:
+            logger.warning("Erro no listener de invalidação do L1: %s", e)
+            l1_cache.clear()
+            time.sleep(1)
+        finally:
+            if sub is not None:
+                sub.close()
+
+
+def _iniciar_listener():
+    global _listener_started
+    if _listener_started or l1_cache.maxsize <= 0 or not backend.compartilhado:
+        return
+    with _listener_lock:
+        if _listener_started:
+            return
+        threading.Thread(target=_escutar_invalidacoes, name="cache-l1-invalidation", daemon=True).start()
+        _listener_started = True
+
+
+class Parcial:
+    """
+    Resultado incompleto retornado por uma fetch_fn (ex: parte da origem não
+    respondeu a tempo). É gravado e devolvido normalmente, mas com soft_ttl de
+    no máximo PARTIAL_SOFT_TTL, para ser completado logo em background.
+    """
+
+    def __init__(self, valor, faltando: list[str] | None = None):
+        self.valor = valor
+        self.faltando = faltando or []
+
+
+def configurar_backend(novo: CacheBackend):
+    """
+    Troca o backend do cache (ex: MemoryBackend em testes e benchmarks).
+    Deve ser chamado antes do primeiro acesso ao cache.
+    """
+    global backend
+    backend = novo
+    l1_cache.clear()
+
+
+def _publicar_invalidacao(key: str):
+    backend.publish(INVALIDATE_CHANNEL, json.dumps({"worker": _worker_id, "key": key}))
+
+
+def _safe_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepara o DataFrame para gravação como Arrow: colunas em string, índice
+    datetime preservado (demais índices em string) e colunas object numéricas.
+    """
     df = df.copy()
     if isinstance(df.columns, pd.MultiIndex):
         df.columns = ['_'.join(map(str, col)).strip() for col in df.columns.values]
     else:
         df.columns = df.columns.map(str)
-    df.index = df.index.map(str)
-    return df.to_dict(orient="index")
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.index = df.index.map(str)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            df[col] = df[col].astype(str)
+    return df
 
 def _safe_series(s: pd.Series) -> dict:
     s = s.copy()
@@ -25,7 +191,7 @@ def _safe_series(s: pd.Series) -> dict:
 
 def serialize(obj):
     if isinstance(obj, pd.DataFrame):
-        return _safe_dict(obj)
+        return _safe_frame(obj)
     elif isinstance(obj, pd.Series):
         return _safe_series(obj)
     elif isinstance(obj, dict):
@@ -43,22 +209,568 @@ def serialize(obj):
             pass
     return obj
 
-def get_cached_data(key: str, ttl: int = None, fetch_fn=None, force: bool = False):
-    if not force:
-        value = redis_client.get(key)
-        if value:
-            print(f"[CACHE] HIT for {key}")
-            return json.loads(value)
+def _wrap(key: str, result, soft_ttl: int | None):
+    if soft_ttl is None and not cache_schema.registrado(key):
+        return result
+    return {
+        ENTRY_MARKER: 1,
+        "schema": cache_schema.versao_atual(key),
+        "soft_expires_at": time.time() + soft_ttl if soft_ttl is not None else None,
+        "value": result,
+    }
+
+
+def _unwrap(data, soft_ttl: int | None = None) -> tuple[object, bool]:
+    """
+    Separa o valor do envelope de cache.
+
+    :return: (valor, obsoleto). Entradas antigas sem envelope são tratadas como
+             obsoletas quando a chave passou a usar soft_ttl.
+    """
+    if isinstance(data, dict) and ENTRY_MARKER in data:
+        expira = data["soft_expires_at"]
+        return data["value"], expira is not None and expira <= time.time()
+    return data, soft_ttl is not None
+
+
+def _migrar(key: str, data):
+    """
+    Adapta entradas gravadas com outra versão de schema da fonte. Entradas
+    migráveis são devolvidas na versão atual e marcadas como obsoletas, para
+    serem rebuscadas em background; as demais contam como miss.
+    """
+    if isinstance(data, dict) and NEGATIVE_MARKER in data:
+        return data
+    envelope = isinstance(data, dict) and ENTRY_MARKER in data
+    versao = data.get("schema", cache_schema.VERSAO_INICIAL) if envelope else cache_schema.VERSAO_INICIAL
+    if versao == cache_schema.versao_atual(key):
+        return data
+    try:
+        valor = cache_schema.migrar(key, data["value"] if envelope else data, versao)
+    except cache_schema.SchemaIncompativel as e:
+        metrics.contar("cache_events_total", key, event="schema_miss")
+        logger.info("Schema incompatível, rebuscando: %s", e)
+        return None
+    except Exception as e:
+        metrics.contar("cache_events_total", key, event="schema_miss")
+        logger.warning("Falha ao migrar %s da versão %s: %s", key, versao, e)
+        return None
+    metrics.contar("cache_events_total", key, event="schema_migrate")
+    return {ENTRY_MARKER: 1, "schema": cache_schema.versao_atual(key), "soft_expires_at": 0, "value": valor}
+
+
+def _raise_if_negative(key: str, data):
+    """Relança o erro registrado em uma entrada negativa."""
+    if isinstance(data, dict) and NEGATIVE_MARKER in data:
+        metrics.contar("cache_requests_total", key, result="negative_hit")
+        cls = ERRORS_BY_TIPO.get(data[NEGATIVE_MARKER], UpstreamError)
+        raise cls(data.get("mensagem", ""), data.get("fonte"))
 
-    print(f"[CACHE] MISS{' (FORCE)' if force else ''} for {key}")
-    result = fetch_fn()
 
+def _store_negative(key: str, erro: UpstreamError):
+    """
+    Grava a entrada negativa apenas se a chave não existir: uma falha da
+    origem nunca sobrescreve um valor válido (ex: force=true ou revalidação).
+    Erros sem TTL negativo (ex: circuit breaker aberto) não são gravados.
+    """
+    if erro.negative_ttl <= 0:
+        return
+    data = {NEGATIVE_MARKER: erro.tipo, "mensagem": str(erro), "fonte": erro.fonte}
+    if not backend.set(key, encode(data), erro.negative_ttl, nx=True):
+        return
+    metrics.contar("cache_events_total", key, event="negative_set")
+    logger.info("Entrada negativa (%s, %ds) para %s: %s", erro.tipo, erro.negative_ttl, key, erro)
+    l1_cache.set(key, data, erro.negative_ttl)
+    _publicar_invalidacao(key)
+
+
+def _store(key: str, ttl: int | None, result, soft_ttl: int | None = None):
+    if isinstance(result, Parcial):
+        metrics.contar("cache_events_total", key, event="partial_set")
+        logger.info("Resultado parcial para %s (faltando: %s)", key, ", ".join(result.faltando) or "?")
+        soft_ttl = PARTIAL_SOFT_TTL if soft_ttl is None else min(soft_ttl, PARTIAL_SOFT_TTL)
+        result = result.valor
     if isinstance(result, dict):
         result = serialize(result)
+    data = _wrap(key, result, soft_ttl)
 
-    print(f"[CACHE] SET for {key}")
-    if ttl is None:
-        redis_client.set(key, json.dumps(result))
-    else:
-        redis_client.setex(key, ttl, json.dumps(result))
+    with metrics.cronometrar("cache_encode_seconds", key):
+        payload = encode(data)
+    metrics.observar("cache_payload_bytes", key, len(payload))
+    metrics.contar("cache_events_total", key, event="set")
+    logger.debug("SET %s (%d bytes)", key, len(payload))
+    backend.set(key, payload, ttl)
+    l1_cache.set(key, data, ttl)
+    _publicar_invalidacao(key)
     return result
+
+
+def _decode(key: str, value: bytes | None):
+    """
+    Decodifica o valor lido do backend, migrando-o para a versão atual do
+    schema da fonte. Entradas ilegíveis ou incompatíveis contam como miss.
+    """
+    if not value:
+        return None
+    metrics.observar("cache_payload_bytes", key, len(value))
+    try:
+        with metrics.cronometrar("cache_decode_seconds", key):
+            data = decode(value)
+    except CodecError as e:
+        metrics.contar("cache_events_total", key, event="decode_error")
+        logger.warning("Entrada ilegível em %s: %s", key, e)
+        return None
+    return _migrar(key, data)
+
+
+def _buscar(key: str, fetch_fn):
+    """Executa a busca na origem registrando sua duração e o cache negativo das falhas."""
+    try:
+        with metrics.cronometrar("cache_fetch_seconds", key):
+            return fetch_fn()
+    except UpstreamError as e:
+        _store_negative(key, e)
+        raise
+
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+
+def _ready_channel(key: str) -> str:
+    return f"cache:ready:{key}"
+
+
+def _liberar_lock(key: str, token: str, status: str):
+    """Libera o lock de busca e avisa os workers em espera ("ok" ou "erro")."""
+    backend.release_lock(_lock_key(key), token)
+    backend.publish(_ready_channel(key), status)
+
+
+def _aguardar_lider(key: str, deadline: float, force: bool):
+    """
+    Espera o worker que detém o lock publicar o resultado.
+
+    Retorna o valor já decodificado ou None quando o lock foi liberado sem
+    resultado utilizável (falha do líder), indicando que deve tentar de novo.
+    """
+    sub = backend.subscribe(_ready_channel(key))
+    try:
+        while time.monotonic() < deadline:
+            message = sub.get_message(timeout=LOCK_POLL)
+            if message is None and backend.exists(_lock_key(key)):
+                continue
+            # Em modo force só aceita o valor se o líder avisou que gravou um novo.
+            if force and message != "ok":
+                return None
+            value = backend.get(key)
+            data = _decode(key, value)
+            if data is None:
+                return None
+            _raise_if_negative(key, data)
+            return _unwrap(data)[0]
+        return None
+    finally:
+        sub.close()
+
+
+def _fetch_distribuido(key: str, ttl: int | None, fetch_fn, force: bool, soft_ttl: int | None = None):
+    """
+    Garante que apenas um worker busque a chave na origem; os demais aguardam
+    o resultado via pub/sub e reutilizam o valor gravado no backend.
+    """
+    deadline = time.monotonic() + LOCK_WAIT
+    lock_key = _lock_key(key)
+    token = uuid.uuid4().hex
+
+    while time.monotonic() < deadline:
+        if backend.acquire_lock(lock_key, token, LOCK_TIMEOUT):
+            status = "erro"
+            try:
+                if not force:
+                    # Outro worker pode ter gravado entre o GET e o lock
+                    data = _decode(key, backend.get(key))
+                    if data is not None:
+                        status = "ok"
+                        _raise_if_negative(key, data)
+                        return _unwrap(data)[0]
+                result = _store(key, ttl, _buscar(key, fetch_fn), soft_ttl)
+                status = "ok"
+                return result
+            finally:
+                _liberar_lock(key, token, status)
+
+        metrics.contar("cache_events_total", key, event="wait")
+        logger.debug("WAIT %s", key)
+        value = _aguardar_lider(key, deadline, force)
+        if value is not None:
+            return value
+
+    metrics.contar("cache_events_total", key, event="lock_timeout")
+    logger.warning("Timeout aguardando o lock de %s; buscando na origem", key)
+    return _store(key, ttl, _buscar(key, fetch_fn), soft_ttl)
+
+
+def _single_flight_local(key: str, fn):
+    """
+    Agrupa buscas simultâneas da mesma chave dentro do processo: a primeira
+    thread executa `fn` e as demais recebem o mesmo resultado (ou exceção).
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        lider = future is None
+        if lider:
+            future = Future()
+            _inflight[key] = future
+
+    if not lider:
+        return future.result()
+
+    try:
+        result = fn()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _revalidar(key: str, ttl: int | None, fetch_fn, soft_ttl: int | None):
+    """
+    Atualiza uma entrada obsoleta. Se outro worker já detém o lock da chave,
+    não faz nada: a revalidação dele vale para todos.
+    """
+    lock_key = _lock_key(key)
+    token = uuid.uuid4().hex
+    if not backend.acquire_lock(lock_key, token, LOCK_TIMEOUT):
+        return
+    status = "erro"
+    try:
+        _store(key, ttl, _buscar(key, fetch_fn), soft_ttl)
+        status = "ok"
+    except Exception as e:
+        metrics.contar("cache_events_total", key, event="revalidate_error")
+        logger.warning("Erro ao revalidar %s: %s", key, e)
+    finally:
+        _liberar_lock(key, token, status)
+
+
+def _revalidar_em_background(key: str, ttl: int | None, fetch_fn, soft_ttl: int | None):
+    with _inflight_lock:
+        if key in _revalidando:
+            return
+        _revalidando.add(key)
+    logger.debug("STALE %s, revalidando em background", key)
+    future = _refresh_executor.submit(_revalidar, key, ttl, fetch_fn, soft_ttl)
+    future.add_done_callback(lambda _: _revalidando.discard(key))
+
+
+def _ler(key: str, ttl: int | None):
+    """Busca a entrada no L1 e, se ausente, no backend. Retorna None em caso de miss."""
+    data = l1_cache.get(key)
+    if data is not None:
+        metrics.contar("cache_requests_total", key, result="l1_hit")
+        return data
+
+    data = _decode(key, backend.get(key))
+    if data is None:
+        return None
+    metrics.contar("cache_requests_total", key, result="hit")
+    logger.debug("HIT %s", key)
+    l1_cache.set(key, data, ttl)
+    return data
+
+
+def _servir(key: str, data, ttl: int | None, fetch_fn, soft_ttl: int | None):
+    """Devolve o valor da entrada lida, agendando revalidação se estiver obsoleto."""
+    _raise_if_negative(key, data)
+    value, obsoleto = _unwrap(data, soft_ttl)
+    if obsoleto and soft_ttl is not None:
+        metrics.contar("cache_requests_total", key, result="stale")
+        _revalidar_em_background(key, ttl, fetch_fn, soft_ttl)
+    return value
+
+
+def get_cached_data(key: str, ttl: int = None, fetch_fn=None, force: bool = False,
+                    single_flight: bool = True, soft_ttl: int = None):
+    """
+    Retorna o valor da chave no cache, buscando via `fetch_fn` em caso de miss.
+
+    :param ttl: Expiração dura (s) no backend; passada ela a busca bloqueia. None = sem expiração
+    :param force: Ignora o cache e busca na origem
+    :param single_flight: Coordena a busca para que apenas um worker acesse a origem
+    :param soft_ttl: Após esse tempo (s) o valor obsoleto é devolvido e atualizado em background.
+                     Resultados Parcial usam no máximo PARTIAL_SOFT_TTL
+    """
+    _iniciar_listener()
+    metrics.iniciar(backend)
+    if not force:
+        data = _ler(key, ttl)
+        if data is not None:
+            return _servir(key, data, ttl, fetch_fn, soft_ttl)
+
+    metrics.contar("cache_requests_total", key, result="force" if force else "miss")
+    logger.debug("MISS%s %s", " (FORCE)" if force else "", key)
+    if not single_flight:
+        return _store(key, ttl, _buscar(key, fetch_fn), soft_ttl)
+
+    return _single_flight_local(key, lambda: _fetch_distribuido(key, ttl, fetch_fn, force, soft_ttl))
+
+
+def get_cached_many(keys: list[str], fetch_fn, ttl: int = None, force: bool = False,
+                    soft_ttl: int = None, max_workers: int = MANY_MAX_WORKERS,
+                    return_exceptions: bool = False, prefetch_fn=None) -> dict:
+    """
+    Versão em lote de get_cached_data: lê todas as chaves com um único MGET e
+    busca apenas as ausentes, em paralelo (cada uma com single-flight).
+
+    :param keys: Chaves desejadas
+    :param fetch_fn: Função que recebe uma chave ausente e retorna seu valor
+    :param prefetch_fn: Opcional. Recebe de uma vez a lista de chaves ausentes antes
+                        das buscas individuais, permitindo buscá-las na origem em uma
+                        única chamada (ex: download em lote). Falhas são ignoradas
+    :param max_workers: Máximo de buscas simultâneas na origem
+    :param return_exceptions: Se True, falhas da origem (UpstreamError) são
+                              devolvidas como valor da chave em vez de lançadas
+    :return: Dicionário chave -> valor, na ordem de `keys`
+    """
+    _iniciar_listener()
+    metrics.iniciar(backend)
+    keys = list(dict.fromkeys(keys))
+    resultado = {}
+    faltando = keys
+
+    if not force:
+        faltando = []
+        pendentes = []
+        for key in keys:
+            data = l1_cache.get(key)
+            if data is None:
+                pendentes.append(key)
+            else:
+                metrics.contar("cache_requests_total", key, result="l1_hit")
+                resultado[key] = data
+
+        if pendentes:
+            for key, value in zip(pendentes, backend.mget(pendentes)):
+                data = _decode(key, value)
+                if data is None:
+                    faltando.append(key)
+                    continue
+                metrics.contar("cache_requests_total", key, result="hit")
+                l1_cache.set(key, data, ttl)
+                resultado[key] = data
+
+        for key, data in resultado.items():
+            try:
+                resultado[key] = _servir(key, data, ttl, partial(fetch_fn, key), soft_ttl)
+            except UpstreamError as e:
+                if not return_exceptions:
+                    raise
+                resultado[key] = e
+
+    if faltando:
+        for key in faltando:
+            metrics.contar("cache_requests_total", key, result="force" if force else "miss")
+        logger.debug("MISS%s %s", " (FORCE)" if force else "", ", ".join(faltando))
+        if prefetch_fn is not None:
+            try:
+                prefetch_fn(faltando)
+            except Exception as e:
+                logger.warning("Falha na busca em lote de %d chaves: %s", len(faltando), e)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(faltando)))) as pool:
+            futures = {
+                key: pool.submit(
+                    _single_flight_local, key,
+                    partial(_fetch_distribuido, key, ttl, partial(fetch_fn, key), force, soft_ttl),
+                )
+                for key in faltando
+            }
+        for key, future in futures.items():
+            erro = future.exception()
+            if erro is not None and not (return_exceptions and isinstance(erro, UpstreamError)):
+                raise erro
+            resultado[key] = erro if erro is not None else future.result()
+
+    return {key: resultado[key] for key in keys}
+
+
+def ler_entradas(keys: list[str]) -> dict:
+    """
+    Lê entradas mantidas diretamente pelo chamador (ver gravar), sem busca na
+    origem nem revalidação. Chaves ausentes ou ilegíveis ficam de fora.
+
+    :return: Dicionário chave -> valor
+    """
+    resultado = {}
+    pendentes = []
+    for key in dict.fromkeys(keys):
+        data = l1_cache.get(key)
+        if data is None:
+            pendentes.append(key)
+        else:
+            resultado[key] = data
+    if pendentes:
+        for key, value in zip(pendentes, backend.mget(pendentes)):
+            data = _decode(key, value)
+            if data is not None:
+                resultado[key] = data
+    return {
+        key: _unwrap(data)[0]
+        for key, data in resultado.items()
+        if not (isinstance(data, dict) and NEGATIVE_MARKER in data)
+    }
+
+
+def gravar(key: str, valor, ttl: int = None):
+    """
+    Grava um valor mantido diretamente pelo chamador (ex: séries atualizadas
+    incrementalmente), notificando os demais workers.
+
+    :param ttl: Expiração (s) no backend. None = sem expiração
+    """
+    _iniciar_listener()
+    metrics.iniciar(backend)
+    return _store(key, ttl, valor)
+
+
+# --- Versão assíncrona ---
+#
+# Mesmo fluxo de get_cached_data para fetch_fn assíncronas (coroutines). As
+# operações no backend e a (de)serialização rodam em threads para não
+# bloquear o event loop; a busca na origem roda no próprio loop.
+
+_inflight_async: dict[tuple[int, str], asyncio.Future] = {}
+_tarefas_async: set[asyncio.Task] = set()
+
+
+async def _buscar_async(key: str, fetch_fn):
+    try:
+        with metrics.cronometrar("cache_fetch_seconds", key):
+            return await fetch_fn()
+    except UpstreamError as e:
+        await asyncio.to_thread(_store_negative, key, e)
+        raise
+
+
+async def _fetch_distribuido_async(key: str, ttl: int | None, fetch_fn, force: bool, soft_ttl: int | None = None):
+    """Equivalente assíncrono de _fetch_distribuido."""
+    deadline = time.monotonic() + LOCK_WAIT
+    token = uuid.uuid4().hex
+
+    while time.monotonic() < deadline:
+        if await asyncio.to_thread(backend.acquire_lock, _lock_key(key), token, LOCK_TIMEOUT):
+            status = "erro"
+            try:
+                if not force:
+                    data = await asyncio.to_thread(lambda: _decode(key, backend.get(key)))
+                    if data is not None:
+                        status = "ok"
+                        _raise_if_negative(key, data)
+                        return _unwrap(data)[0]
+                result = await _buscar_async(key, fetch_fn)
+                result = await asyncio.to_thread(_store, key, ttl, result, soft_ttl)
+                status = "ok"
+                return result
+            finally:
+                await asyncio.to_thread(_liberar_lock, key, token, status)
+
+        metrics.contar("cache_events_total", key, event="wait")
+        logger.debug("WAIT %s", key)
+        value = await asyncio.to_thread(_aguardar_lider, key, deadline, force)
+        if value is not None:
+            return value
+
+    metrics.contar("cache_events_total", key, event="lock_timeout")
+    logger.warning("Timeout aguardando o lock de %s; buscando na origem", key)
+    return await asyncio.to_thread(_store, key, ttl, await _buscar_async(key, fetch_fn), soft_ttl)
+
+
+async def _single_flight_local_async(key: str, fn):
+    """Agrupa buscas simultâneas da mesma chave no event loop atual."""
+    loop = asyncio.get_running_loop()
+    inflight_key = (id(loop), key)
+    future = _inflight_async.get(inflight_key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = loop.create_future()
+    _inflight_async[inflight_key] = future
+    try:
+        result = await fn()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        # Evita o aviso de exceção não recuperada quando ninguém mais aguarda
+        future.exception()
+        raise
+    finally:
+        _inflight_async.pop(inflight_key, None)
+
+
+async def _revalidar_async(key: str, ttl: int | None, fetch_fn, soft_ttl: int | None):
+    token = uuid.uuid4().hex
+    if not await asyncio.to_thread(backend.acquire_lock, _lock_key(key), token, LOCK_TIMEOUT):
+        return
+    status = "erro"
+    try:
+        await asyncio.to_thread(_store, key, ttl, await _buscar_async(key, fetch_fn), soft_ttl)
+        status = "ok"
+    except Exception as e:
+        metrics.contar("cache_events_total", key, event="revalidate_error")
+        logger.warning("Erro ao revalidar %s: %s", key, e)
+    finally:
+        await asyncio.to_thread(_liberar_lock, key, token, status)
+
+
+def _revalidar_em_background_async(key: str, ttl: int | None, fetch_fn, soft_ttl: int | None):
+    with _inflight_lock:
+        if key in _revalidando:
+            return
+        _revalidando.add(key)
+    logger.debug("STALE %s, revalidando em background", key)
+    task = asyncio.get_running_loop().create_task(_revalidar_async(key, ttl, fetch_fn, soft_ttl))
+    _tarefas_async.add(task)
+
+    def concluir(_):
+        _tarefas_async.discard(task)
+        _revalidando.discard(key)
+
+    task.add_done_callback(concluir)
+
+
+async def get_cached_data_async(key: str, ttl: int = None, fetch_fn=None, force: bool = False,
+                                single_flight: bool = True, soft_ttl: int = None):
+    """
+    Versão assíncrona de get_cached_data, para fetch_fn assíncronas.
+
+    :param fetch_fn: Função sem argumentos que retorna uma coroutine com o valor
+    """
+    _iniciar_listener()
+    metrics.iniciar(backend)
+    if not force:
+        data = l1_cache.get(key)
+        if data is not None:
+            metrics.contar("cache_requests_total", key, result="l1_hit")
+        else:
+            data = await asyncio.to_thread(_ler, key, ttl)
+        if data is not None:
+            _raise_if_negative(key, data)
+            value, obsoleto = _unwrap(data, soft_ttl)
+            if obsoleto and soft_ttl is not None:
+                metrics.contar("cache_requests_total", key, result="stale")
+                _revalidar_em_background_async(key, ttl, fetch_fn, soft_ttl)
+            return value
+
+    metrics.contar("cache_requests_total", key, result="force" if force else "miss")
+    logger.debug("MISS%s %s", " (FORCE)" if force else "", key)
+    if not single_flight:
+        return await asyncio.to_thread(_store, key, ttl, await _buscar_async(key, fetch_fn), soft_ttl)
+
+    return await _single_flight_local_async(
+        key, lambda: _fetch_distribuido_async(key, ttl, fetch_fn, force, soft_ttl)
+    )
@@ -0,0 +1,71 @@
+import hashlib
+import logging
+
+from app.utils import cache_metrics as metrics
+from app.utils.redis_cache import gravar, ler_entradas
+
+logger = logging.getLogger(__name__)
+
+# Validadores HTTP (ETag, Last-Modified e hash do conteúdo) das páginas
+# raspadas, gravados ao lado da entrada do cache. Ao atualizar a entrada a
+# página é pedida com requisição condicional: se o site responder 304, ou o
+# conteúdo tiver o mesmo hash, o valor em cache é regravado sem novo parse.
+
+
+def validadores_key(key: str) -> str:
+    return f"validadores:{key}"
+
+
+def _hash(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8", "replace")).hexdigest()
+
+
+class Condicional:
+    """
+    Revalidação de uma entrada do cache. Lê o valor atual e seus validadores;
+    sem valor atual a requisição é feita normalmente.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        entradas = ler_entradas([key, validadores_key(key)])
+        self.valor = entradas.get(key)
+        self.validadores = entradas.get(validadores_key(key)) if self.valor is not None else None
+
+    @property
+    def headers(self) -> dict:
+        """Cabeçalhos da requisição condicional (If-None-Match, If-Modified-Since)."""
+        if not self.validadores:
+            return {}
+        headers = {}
+        if self.validadores.get("etag"):
+            headers["If-None-Match"] = self.validadores["etag"]
+        if self.validadores.get("last_modified"):
+            headers["If-Modified-Since"] = self.validadores["last_modified"]
+        return headers
+
+    def inalterado(self, resposta) -> bool:
+        """
+        Indica se a página não mudou (304 ou mesmo hash); nesse caso self.valor
+        deve ser devolvido no lugar de um novo parse.
+        """
+        if not self.validadores:
+            return False
+        if resposta.status_code == 304:
+            motivo = "304"
+        elif resposta.status_code == 200 and _hash(resposta.text) == self.validadores.get("hash"):
+            motivo = "hash"
+            self.salvar(resposta)
+        else:
+            return False
+        metrics.contar("cache_events_total", self.key, event="not_modified")
+        logger.debug("Inalterado (%s): %s", motivo, self.key)
+        return True
+
+    def salvar(self, resposta):
+        """Grava os validadores da resposta, após o parse bem-sucedido."""
+        gravar(validadores_key(self.key), {
+            "etag": resposta.headers.get("ETag"),
+            "last_modified": resposta.headers.get("Last-Modified"),
+            "hash": _hash(resposta.text),
+        })
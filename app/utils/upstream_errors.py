@@ -0,0 +1,96 @@
+import os
+
+import requests
+from yfinance.exceptions import YFException, YFRateLimitError, YFTickerMissingError
+
+try:
+    # Transporte HTTP do yfinance a partir da 0.2.55; não deriva de requests.RequestException
+    from curl_cffi import CurlError
+except ImportError:
+    CurlError = None
+
+
+class UpstreamError(Exception):
+    """
+    Falha classificada ao buscar dados em uma fonte externa. O cache grava uma
+    entrada negativa com TTL curto para que consultas repetidas não voltem à origem.
+    """
+
+    tipo = "upstream_error"
+    negative_ttl = int(os.getenv("CACHE_NEGATIVE_TTL_ERROR", 60))
+
+    def __init__(self, mensagem: str, fonte: str | None = None):
+        super().__init__(mensagem)
+        self.fonte = fonte
+
+
+class TickerNotFoundError(UpstreamError):
+    """Ticker inexistente ou página de erro na fonte."""
+
+    tipo = "not_found"
+    negative_ttl = int(os.getenv("CACHE_NEGATIVE_TTL_NOT_FOUND", 3600))
+
+
+class UpstreamThrottledError(UpstreamError):
+    """A fonte limitou as requisições (HTTP 429)."""
+
+    tipo = "throttled"
+    negative_ttl = int(os.getenv("CACHE_NEGATIVE_TTL_THROTTLED", 30))
+
+
+class CircuitOpenError(UpstreamError):
+    """
+    O circuit breaker da fonte está aberto: a busca nem chega a ser feita.
+    Não gera entrada negativa, o próprio breaker já evita novas tentativas.
+    """
+
+    tipo = "circuit_open"
+    negative_ttl = 0
+
+
+ERRORS_BY_TIPO = {
+    cls.tipo: cls for cls in (UpstreamError, TickerNotFoundError, UpstreamThrottledError, CircuitOpenError)
+}
+
+
+def from_status(status_code: int, mensagem: str, fonte: str | None = None) -> UpstreamError | None:
+    """
+    Classifica um status HTTP de erro. Retorna None para respostas de sucesso.
+
+    :param status_code: Status da resposta
+    :param mensagem: Descrição usada na exceção
+    :param fonte: Nome da fonte (ex: "fiiscom")
+    """
+    if status_code < 400:
+        return None
+    if status_code in (404, 410):
+        return TickerNotFoundError(mensagem, fonte)
+    if status_code == 429:
+        return UpstreamThrottledError(mensagem, fonte)
+    return UpstreamError(mensagem, fonte)
+
+
+def raise_for_status(response, fonte: str):
+    """Equivalente a response.raise_for_status(), lançando o erro classificado."""
+    erro = from_status(response.status_code, f"{fonte}: HTTP {response.status_code} em {response.url}", fonte)
+    if erro is not None:
+        raise erro
+
+
+def from_exception(e: Exception, fonte: str) -> UpstreamError | None:
+    """
+    Classifica exceções de rede/HTTP (requests, curl_cffi) e do yfinance.
+    Retorna None para exceções que não vêm da origem.
+    """
+    if isinstance(e, UpstreamError):
+        return e
+    if isinstance(e, YFRateLimitError):
+        return UpstreamThrottledError(f"{fonte}: {e}", fonte)
+    if isinstance(e, YFTickerMissingError):
+        return TickerNotFoundError(f"{fonte}: {e}", fonte)
+    response = getattr(e, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return from_status(response.status_code, f"{fonte}: {e}", fonte)
+    if isinstance(e, (requests.RequestException, YFException)) or CurlError is not None and isinstance(e, CurlError):
+        return UpstreamError(f"{fonte}: {e}", fonte)
+    return None
@@ -21,6 +21,19 @@ CREATE TABLE IF NOT EXISTS indices_banco_central (
     data_atualizacao TEXT
 );
 
+-- Séries históricas do Banco Central (SGS), sincronizadas de forma incremental
+CREATE TABLE IF NOT EXISTS series_banco_central (
+    codigo INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (codigo, data)
+);
+
+CREATE TABLE IF NOT EXISTS series_banco_central_sync (
+    codigo INTEGER PRIMARY KEY,
+    sincronizado_em TEXT NOT NULL
+);
+
 -- Transações de ações
 CREATE TABLE IF NOT EXISTS transacoes_acoes (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
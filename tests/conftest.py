@@ -0,0 +1,18 @@
+import os
+
+# Cache no próprio processo: os testes não dependem de Redis
+os.environ["CACHE_BACKEND"] = "memory"
+
+import pytest
+
+from app.utils import redis_cache
+from app.utils.cache_backends import MemoryBackend
+
+
+@pytest.fixture(autouse=True)
+def cache_vazio(monkeypatch):
+    """Cada teste começa com o cache (backend e L1) vazio."""
+    monkeypatch.setattr(redis_cache, "backend", MemoryBackend())
+    redis_cache.l1_cache.clear()
+    yield
+    redis_cache.l1_cache.clear()
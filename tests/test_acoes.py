@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import trim_mean
+
+from app.services import acoes
+from app.utils import redis_cache
+from app.utils.cache_codec import encode
+
+COLUNAS_YF = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+def download_por_ticker(precos: dict[str, pd.DataFrame]):
+    """yf.download falso, no formato de group_by="ticker" (Open primeiro em cada ticker)."""
+    chamadas = []
+
+    def download(tickers, start=None, period=None, **kwargs):
+        chamadas.append(start or period)
+        partes = {}
+        for ticker in tickers:
+            df = precos[ticker]
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            partes[ticker] = df[COLUNAS_YF]
+        return pd.concat(partes, axis=1)
+
+    download.chamadas = chamadas
+    return download
+
+
+def historico(datas: pd.DatetimeIndex, fechamento: np.ndarray) -> pd.DataFrame:
+    """Abertura bem diferente do fechamento ajustado, para distinguir as colunas."""
+    return pd.DataFrame({
+        "Open": fechamento / 2,
+        "High": fechamento * 1.1,
+        "Low": fechamento / 3,
+        "Close": fechamento * 1.05,
+        "Adj Close": fechamento,
+        "Volume": np.full(len(datas), 1000.0),
+    }, index=datas)
+
+
+@pytest.fixture
+def precos():
+    datas = pd.bdate_range("2023-01-02", "2024-12-31")
+    return {"VALE3.SA": historico(datas, np.linspace(10, 40, len(datas)))}
+
+
+def test_historico_com_adj_close_primeiro(monkeypatch, precos):
+    monkeypatch.setattr(acoes.yf, "download", download_por_ticker(precos))
+
+    df = acoes.baixar_historicos(["VALE3.SA"])["VALE3.SA"]
+
+    assert list(df.columns[:2]) == ["Adj Close", "Close"]
+    pd.testing.assert_series_equal(df["Adj Close"], precos["VALE3.SA"]["Adj Close"], check_freq=False)
+
+
+def test_media_ponderada_usa_adj_close(monkeypatch, precos):
+    monkeypatch.setattr(acoes.yf, "download", download_por_ticker(precos))
+    adj_close = acoes.baixar_historicos(["VALE3.SA"])["VALE3.SA"]
+    acao = acoes.Acao("VALE3.SA", dados={"info": {}, "income_stmt": pd.DataFrame()}, adj_close=adj_close)
+
+    original = precos["VALE3.SA"]
+    for ano in (2023, 2024):
+        ultimos = original[original.index.year == ano].tail(30)
+        assert acao.media_ponderada_fechamento(ano) == pytest.approx(trim_mean(ultimos["Adj Close"], 0.1))
+        assert acao.media_ponderada_fechamento(ano) != pytest.approx(trim_mean(ultimos["Open"], 0.1))
+
+
+def test_media_ponderada_sem_adj_close_usa_close(precos):
+    adj_close = precos["VALE3.SA"].drop(columns="Adj Close")
+    acao = acoes.Acao("VALE3.SA", dados={"info": {}, "income_stmt": pd.DataFrame()}, adj_close=adj_close)
+
+    ultimos = adj_close[adj_close.index.year == 2024].tail(30)
+    assert acao.media_ponderada_fechamento(2024) == pytest.approx(trim_mean(ultimos["Close"], 0.1))
+
+
+def test_atualizacao_incremental_substitui_ultimo_pregao(monkeypatch, precos):
+    download = download_por_ticker(precos)
+    monkeypatch.setattr(acoes.yf, "download", download)
+    acoes.atualizar_historicos(["VALE3.SA"])
+
+    # Só a cotação do pregão em andamento mudou: não é ajuste retroativo
+    original = precos["VALE3.SA"]
+    precos["VALE3.SA"] = original.copy()
+    precos["VALE3.SA"].iloc[-1] *= 1.02
+    df = acoes.atualizar_historicos(["VALE3.SA"])["VALE3.SA"]
+
+    assert download.chamadas == ["5y", original.index[-2].strftime("%Y-%m-%d")]
+    assert df["Adj Close"].iloc[-1] == pytest.approx(original["Adj Close"].iloc[-1] * 1.02)
+    assert len(df) == len(original)
+    assert list(df.columns[:2]) == ["Adj Close", "Close"]
+    gravado = acoes.ler_historicos(["VALE3.SA"])["VALE3.SA"]
+    pd.testing.assert_frame_equal(gravado, df, check_freq=False)
+
+
+def test_atualizacao_incremental_acrescenta_pregoes(monkeypatch, precos):
+    completo = precos["VALE3.SA"]
+    precos["VALE3.SA"] = completo.iloc[:-5]
+    download = download_por_ticker(precos)
+    monkeypatch.setattr(acoes.yf, "download", download)
+    acoes.atualizar_historicos(["VALE3.SA"])
+
+    precos["VALE3.SA"] = completo
+    df = acoes.atualizar_historicos(["VALE3.SA"])["VALE3.SA"]
+
+    assert download.chamadas[1:] == [completo.index[-7].strftime("%Y-%m-%d")]
+    pd.testing.assert_index_equal(df.index, completo.index, check_exact=True, exact=False)
+    pd.testing.assert_series_equal(df["Adj Close"], completo["Adj Close"], check_freq=False)
+
+
+def test_ajuste_retroativo_baixa_historico_inteiro(monkeypatch, precos):
+    download = download_por_ticker(precos)
+    monkeypatch.setattr(acoes.yf, "download", download)
+    acoes.atualizar_historicos(["VALE3.SA"])
+
+    # Dividendo: todos os preços ajustados anteriores mudam
+    precos["VALE3.SA"] = precos["VALE3.SA"] * 0.98
+    df = acoes.atualizar_historicos(["VALE3.SA"])["VALE3.SA"]
+
+    assert download.chamadas[-1] == "5y"
+    pd.testing.assert_series_equal(df["Adj Close"], precos["VALE3.SA"]["Adj Close"], check_freq=False)
+
+
+def test_migra_historico_v1_com_open_primeiro(precos):
+    antigo = precos["VALE3.SA"][COLUNAS_YF]
+    redis_cache.backend.set(acoes.historico_key("VALE3.SA"), encode({
+        redis_cache.ENTRY_MARKER: 1,
+        "schema": 1,
+        "soft_expires_at": None,
+        "value": {"adj_close": antigo, "sincronizado_em": 0},
+    }))
+
+    df = acoes.ler_historicos(["VALE3.SA"])["VALE3.SA"]
+
+    assert list(df.columns) == acoes.COLUNAS_HISTORICO
+    pd.testing.assert_series_equal(df["Adj Close"], antigo["Adj Close"], check_freq=False)
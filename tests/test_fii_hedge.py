@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.services import fii as fiimod
+from app.services.fii import FII
+from app.services.fii_yf import FIIYahooService
+from app.services.fiiscom import FiisComService
+from app.services.investidor10 import Investidor10Service
+from app.utils import circuit_breaker
+from app.utils.upstream_errors import UpstreamError
+
+
+def fiiscom(segmento: str = "") -> dict:
+    return dict(FiisComService.DADOS_VAZIOS, info_extra={"Segmento": segmento})
+
+
+def i10(segmento: str | None = None) -> dict:
+    return dict(Investidor10Service.DADOS_VAZIOS, segmento=segmento)
+
+
+def busca(dados, atraso: float = 0):
+    async def buscar(ticker):
+        await asyncio.sleep(atraso)
+        return dados
+    return buscar
+
+
+@pytest.fixture
+def hedge_curto(monkeypatch):
+    """Prazo de hedge de 50ms para todas as fontes com histórico de latência."""
+    monkeypatch.setattr(fiimod, "HEDGE_PERCENTIL", 95)
+    monkeypatch.setattr(fiimod, "HEDGE_MIN", 0.05)
+    monkeypatch.setattr(circuit_breaker, "percentil_latencia", lambda nome, p: 0.05)
+
+
+def test_hedge_segue_sem_yahoo_lento(monkeypatch, hedge_curto):
+    monkeypatch.setitem(fiimod.BUSCAS_ASYNC, "yf", busca(FIIYahooService.DADOS_VAZIOS, atraso=0.5))
+    monkeypatch.setitem(fiimod.BUSCAS_ASYNC, "fiiscom", busca(fiiscom("Logística")))
+    monkeypatch.setitem(fiimod.BUSCAS_ASYNC, "i10", busca(i10("Logística"), atraso=0.2))
+
+    async def carregar():
+        dados = await fiimod._dados_fiis_async(["HGLG11.SA"])
+        # Não deixa a busca do Yahoo em background pendente ao fechar o loop
+        await asyncio.gather(*fiimod._buscas_em_background)
+        return dados
+
+    dados = asyncio.run(carregar())["HGLG11.SA"]
+
+    assert isinstance(dados["yf"], UpstreamError)
+    assert dados["yf"].fonte == "yahoo"
+    assert dados["fiiscom"]["info_extra"] == {"Segmento": "Logística"}
+    # O Investidor10 nunca é substituído pelo hedge: é a fonte do segmento
+    assert dados["i10"]["segmento"] == "Logística"
+
+
+def test_segmento_recorre_ao_fiiscom():
+    ativo = FII("HGLG11.SA", dados={
+        "yf": FIIYahooService.DADOS_VAZIOS,
+        "fiiscom": fiiscom("Logística"),
+        "i10": UpstreamError("investidor10: sem resposta", "investidor10"),
+    })
+
+    assert ativo.segmento() == "logistica"
+
+
+def test_spread_sem_segmento_gera_upstream_error():
+    class Indicadores:
+        def get_spread(self, tipo):
+            return {"logistica": 3.0}.get(tipo)
+
+    ativo = FII("HGLG11.SA", dados={
+        "yf": FIIYahooService.DADOS_VAZIOS,
+        "fiiscom": fiiscom(),
+        "i10": i10(),
+    })
+
+    with pytest.raises(UpstreamError):
+        ativo._spread(Indicadores())
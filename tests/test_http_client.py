@@ -0,0 +1,86 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.utils import http_client, rate_limit
+
+
+class Servidor(BaseHTTPRequestHandler):
+    """Responde 429 às primeiras `falhas` requisições e 200 às seguintes."""
+
+    falhas = 0
+    recebidas = 0
+
+    def do_GET(self):
+        type(self).recebidas += 1
+        if self.recebidas <= self.falhas:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    Servidor.falhas = Servidor.recebidas = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Servidor)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def reservas(monkeypatch):
+    """URLs de cada reserva no limite de requisições, sem backoff entre tentativas."""
+    urls = []
+    aguardar = rate_limit.aguardar
+
+    def contar(url):
+        urls.append(url)
+        aguardar(url)
+
+    monkeypatch.setattr(rate_limit, "aguardar", contar)
+    monkeypatch.setattr(http_client, "BACKOFF", 0)
+    return urls
+
+
+def test_cada_tentativa_passa_pelo_limite(servidor, reservas):
+    Servidor.falhas = 2
+
+    resp = http_client.get(servidor)
+
+    assert resp.status_code == 200
+    assert Servidor.recebidas == 3
+    assert reservas == [servidor] * 3
+
+
+def test_tentativas_esgotadas_devolvem_ultima_resposta(servidor, reservas, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 2)
+    Servidor.falhas = 10
+
+    resp = http_client.get(servidor)
+
+    assert resp.status_code == 429
+    assert Servidor.recebidas == 3
+    assert len(reservas) == 3
+
+
+def test_falha_de_conexao_tambem_passa_pelo_limite(reservas, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 2)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{s.getsockname()[1]}/"
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(url)
+
+    assert reservas == [url] * 3